@@ -27,7 +27,7 @@ from mobi.metadata_agent import (
     analyze_and_update_table,
     summarize_table,
 )
-from mobi.sample_agent import DatabricksAgent, demo as sample_agent_demo
+from mobi.sample_agent import DatabricksAgent, demo as sample_agent_demo, get_default_agent
 
 __version__ = "0.1.0"
 
@@ -48,5 +48,6 @@ __all__ = [
     "analyze_and_update_table",
     "summarize_table",
     "DatabricksAgent",
+    "get_default_agent",
     "sample_agent_demo",
 ]
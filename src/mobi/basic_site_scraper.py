@@ -1,44 +1,295 @@
 """Generic basic site scraping functionality."""
 
+import hashlib
 import logging
+import re
+import threading
 import time
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import Optional
 from urllib.parse import urljoin, urlparse
 
-import requests
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
+import httpx
+from lxml import etree
+from lxml import html as lxml_html
 
 logger = logging.getLogger(__name__)
 
+# HTTP/2 clients shared by every scraper with the same User-Agent, so
+# concurrent workers (and scrapers) multiplex over the same connections.
+# Entries go away once no scraper holds the client any more.
+_CLIENTS: "weakref.WeakValueDictionary[str, httpx.Client]" = weakref.WeakValueDictionary()
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _shared_client(user_agent: str) -> httpx.Client:
+    """Return the shared HTTP client for ``user_agent``, creating it if needed."""
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(user_agent)
+        if client is None:
+            client = httpx.Client(
+                http2=True,
+                headers={"User-Agent": user_agent},
+                timeout=30,
+                follow_redirects=True,
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+            )
+            _CLIENTS[user_agent] = client
+        return client
+
+
+# Elements dropped from the markdown output entirely (their tail text is kept)
+_MD_SKIP_TAGS = frozenset({"script", "style", "nav", "footer", "header", "noscript", "template"})
+_MD_INLINE_TAGS = frozenset(
+    {
+        "a",
+        "abbr",
+        "b",
+        "br",
+        "cite",
+        "code",
+        "em",
+        "font",
+        "i",
+        "img",
+        "kbd",
+        "label",
+        "mark",
+        "s",
+        "small",
+        "span",
+        "strong",
+        "sub",
+        "sup",
+        "time",
+        "u",
+    }
+)
+_MD_HEADING_LEVELS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+_MD_LINE_BREAK = "\x00"
+_WHITESPACE_RE = re.compile(r"\s+")
+_SPACE_RUN_RE = re.compile(r" {2,}")
+_MD_ESCAPE_RE = re.compile(r"([\\`*_])")
+
+
+def _md_text(text: str) -> str:
+    """Collapse whitespace in a text node and escape Markdown metacharacters."""
+    return _MD_ESCAPE_RE.sub(r"\\\1", _WHITESPACE_RE.sub(" ", text))
+
+
+def _render_markdown(element: lxml_html.HtmlElement) -> str:
+    """Render an lxml element tree as Markdown.
+
+    Covers the structure found on content pages (ATX headings, paragraphs,
+    links, emphasis, "-" bullet and numbered lists, block quotes, code
+    blocks, images and simple tables). Output is collected in lists and
+    joined once rather than built by repeated string concatenation.
+    """
+    return "\n\n".join(_render_blocks(element))
+
+
+def _render_blocks(element: lxml_html.HtmlElement) -> list[str]:
+    """Render the children of a block-level element as a list of Markdown blocks."""
+    blocks: list[str] = []
+    inline: list[str] = []
+
+    def flush() -> None:
+        text = _SPACE_RUN_RE.sub(" ", "".join(inline)).strip(" ")
+        text = text.replace(f" {_MD_LINE_BREAK}", _MD_LINE_BREAK)
+        text = text.replace(_MD_LINE_BREAK, "  \n").strip()
+        if text:
+            blocks.append(text)
+        inline.clear()
+
+    if element.text:
+        inline.append(_md_text(element.text))
+
+    for child in element:
+        tag = child.tag if isinstance(child.tag, str) else None
+        if tag is None or tag in _MD_SKIP_TAGS:
+            pass
+        elif tag in _MD_INLINE_TAGS:
+            inline.append(_render_inline(child))
+        else:
+            flush()
+            blocks.extend(_render_block(child, tag))
+
+        if child.tail:
+            inline.append(_md_text(child.tail))
+
+    flush()
+    return blocks
+
+
+def _render_block(element: lxml_html.HtmlElement, tag: str) -> list[str]:
+    """Render one block-level element."""
+    if tag in _MD_HEADING_LEVELS:
+        # An ATX heading must stay on one line, so line breaks become spaces
+        text = _WHITESPACE_RE.sub(" ", " ".join(_render_blocks(element)))
+        return [f"{'#' * _MD_HEADING_LEVELS[tag]} {text}"] if text else []
+
+    if tag in ("ul", "ol"):
+        items = []
+        number = 1
+        for child in element:
+            if child.tag != "li":
+                continue
+            marker = f"{number}. " if tag == "ol" else "- "
+            number += 1
+            indent = " " * len(marker)
+            lines = "\n".join(_render_blocks(child)).splitlines() or [""]
+            items.append(
+                "\n".join(
+                    [marker + lines[0]] + [indent + line if line else line for line in lines[1:]]
+                )
+            )
+        return ["\n".join(items)] if items else []
+
+    if tag == "blockquote":
+        body = "\n\n".join(_render_blocks(element))
+        return ["\n".join(f"> {line}" if line else ">" for line in body.splitlines())]
+
+    if tag == "pre":
+        code = element.text_content().strip("\n")
+        return [f"```\n{code}\n```"]
+
+    if tag == "hr":
+        return ["---"]
+
+    if tag == "table":
+        return _render_table(element)
+
+    return _render_blocks(element)
+
+
+def _render_inline(element: lxml_html.HtmlElement) -> str:
+    """Render an inline element (and its descendants) as Markdown text."""
+    tag = element.tag
+    if tag == "br":
+        return _MD_LINE_BREAK
+    if tag == "img":
+        return f"![{element.get('alt', '')}]({element.get('src', '')})"
+
+    if tag in ("code", "kbd"):
+        # Code spans are literal: no escaping and no nested markup
+        text = _WHITESPACE_RE.sub(" ", element.text_content())
+    else:
+        parts: list[str] = []
+        if element.text:
+            parts.append(_md_text(element.text))
+        for child in element:
+            child_tag = child.tag if isinstance(child.tag, str) else None
+            if child_tag is None or child_tag in _MD_SKIP_TAGS:
+                pass
+            elif child_tag in _MD_INLINE_TAGS:
+                parts.append(_render_inline(child))
+            else:
+                # Block content inside an inline element (e.g. a card-style
+                # link wrapping <div>/<p>) is flattened, one space per block
+                blocks = " ".join(_render_block(child, child_tag))
+                parts.append(f" {_WHITESPACE_RE.sub(' ', blocks)} ")
+            if child.tail:
+                parts.append(_md_text(child.tail))
+        text = "".join(parts)
+
+    # Keep surrounding spaces outside of the markup so "**x** y" stays valid
+    stripped = text.strip()
+    if not stripped:
+        return text
+    lead = " " if text[0] == " " else ""
+    trail = " " if text[-1] == " " else ""
+
+    if tag == "a":
+        href = element.get("href")
+        return f"{lead}[{stripped}]({href}){trail}" if href else text
+    if tag in ("strong", "b"):
+        return f"{lead}**{stripped}**{trail}"
+    if tag in ("em", "i"):
+        return f"{lead}*{stripped}*{trail}"
+    if tag in ("code", "kbd"):
+        return f"{lead}`{stripped}`{trail}"
+    return text
+
+
+def _table_cell(cell: lxml_html.HtmlElement) -> str:
+    """Render a table cell on one line, escaping the pipes that delimit cells."""
+    text = _WHITESPACE_RE.sub(" ", " ".join(_render_blocks(cell)))
+    return text.replace("|", "\\|")
+
+
+def _render_table(table: lxml_html.HtmlElement) -> list[str]:
+    """Render a table as a pipe table, using the first row as the header."""
+    rows = [
+        [_table_cell(cell) for cell in row if cell.tag in ("th", "td")]
+        for row in table.iter("tr")
+    ]
+    rows = [row for row in rows if row]
+    if not rows:
+        return []
+
+    width = max(len(row) for row in rows)
+    lines = []
+    for i, row in enumerate(rows):
+        cells = row + [""] * (width - len(row))
+        lines.append("| " + " | ".join(cells) + " |")
+        if i == 0:
+            lines.append("| " + " | ".join(["---"] * width) + " |")
+    return ["\n".join(lines)]
+
 
 class BasicSiteScraper:
     """Recursive web scraper for a single website."""
 
+    # Skipped file types (by suffix) and URL patterns, matched in one pass
+    _BLOCK_RE = re.compile(
+        r"\.(?:pdf|jpe?g|png|gif|css|js|xml)$|/(?:api/|admin/|login|logout|register)",
+        re.IGNORECASE,
+    )
+
+    # Compiled once; each evaluates to a string ("" when nothing matches)
+    _TITLE_XPATH = etree.XPath("string((//title)[1])")
+    _DESCRIPTION_XPATH = etree.XPath("string((//meta[@name='description'])[1]/@content)")
+    _MAIN_HEADING_XPATH = etree.XPath("string((//h1 | //h2)[1])")
+
     def __init__(
         self,
         base_url: str,
         delay: float = 1.0,
         max_depth: int = 3,
         user_agent: str = "BasicSiteScraper/1.0",
+        max_workers: int = 4,
     ):
         """Initialize the scraper.
 
         Args:
             base_url: Base URL of the site to constrain scraping to
-            delay: Delay between requests in seconds
+            delay: Delay between requests in seconds, per worker. Request
+                starts are spaced ``delay / max_workers`` apart, so with the
+                default ``max_workers=4`` the site is hit 4x as often as by a
+                sequential crawl with the same ``delay``; pass
+                ``max_workers=1`` to keep one request per ``delay``.
             max_depth: Maximum depth to crawl
             user_agent: User agent string for requests
+            max_workers: Number of pages fetched concurrently while crawling
         """
         self.base_url = base_url
         self.base_netloc = urlparse(base_url).netloc
         self.delay = delay
         self.max_depth = max_depth
-        self.session = requests.Session()
-        self.session.headers.update({"User-Agent": user_agent})
+        self.max_workers = max(1, max_workers)
+        # Shared with every scraper using the same User-Agent (see
+        # _shared_client), so it is private: changing its headers or settings
+        # would affect all of them.
+        self._client = _shared_client(user_agent)
 
         self.visited_urls: set[str] = set()
         self.scraped_content: dict[str, dict] = {}
+        self._content_digests: set[bytes] = set()
+
+        self._lock = threading.Lock()
+        self._next_request_at = 0.0
 
     def _is_valid_url(self, url: str) -> bool:
         """Check if URL is valid for scraping."""
@@ -48,71 +299,54 @@ class BasicSiteScraper:
         if parsed.netloc != self.base_netloc:
             return False
 
-        # Skip certain file types
-        skip_extensions = {
-            ".pdf",
-            ".jpg",
-            ".jpeg",
-            ".png",
-            ".gif",
-            ".css",
-            ".js",
-            ".xml",
-        }
-        if any(url.lower().endswith(ext) for ext in skip_extensions):
-            return False
-
-        # Skip certain URL patterns
-        skip_patterns = ["/api/", "/admin/", "/login", "/logout", "/register"]
-        if any(pattern in url for pattern in skip_patterns):
+        # Skip certain file types and URL patterns
+        if self._BLOCK_RE.search(url):
             return False
 
         return True
 
-    def _extract_links(self, soup: BeautifulSoup, current_url: str) -> list[str]:
+    def _extract_links(self, tree: lxml_html.HtmlElement, current_url: str) -> list[str]:
         """Extract all valid links from a page."""
-        links = []
+        # dict keys dedupe while keeping discovery order for the BFS frontier
+        links: dict[str, None] = {}
 
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
+        for link in tree.iter("a"):
+            href = link.get("href")
+            if href is None:
+                continue
             absolute_url = urljoin(current_url, href)
 
-            if self._is_valid_url(absolute_url):
-                links.append(absolute_url)
+            if absolute_url not in links and self._is_valid_url(absolute_url):
+                links[absolute_url] = None
 
-        return list(set(links))  # Remove duplicates
+        return list(links)
 
-    def _clean_html(self, soup: BeautifulSoup) -> BeautifulSoup:
+    def _clean_html(self, tree: lxml_html.HtmlElement) -> lxml_html.HtmlElement:
         """Clean HTML content for better markdown conversion."""
-        # Remove script and style elements and common layout containers
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
-
-        # Remove comments
-        from bs4 import Comment
-
-        comments = soup.find_all(string=lambda text: isinstance(text, Comment))
-        for comment in comments:
-            comment.extract()
+        # Remove script and style elements, common layout containers and
+        # comments in a single pass, keeping any text that follows them
+        etree.strip_elements(
+            tree,
+            "script",
+            "style",
+            "nav",
+            "footer",
+            "header",
+            etree.Comment,
+            with_tail=False,
+        )
 
         # Clean up empty paragraphs
-        for p in soup.find_all("p"):
-            if not p.get_text(strip=True):
-                p.decompose()
+        for p in tree.xpath("//p[not(normalize-space())]"):
+            p.drop_tree()
 
-        return soup
+        return tree
 
-    def _extract_metadata(self, soup: BeautifulSoup, url: str) -> dict:
+    def _extract_metadata(self, tree: lxml_html.HtmlElement, url: str) -> dict:
         """Extract metadata from the page."""
-        title = soup.find("title")
-        title_text = title.get_text(strip=True) if title else "Untitled"
-
-        description = soup.find("meta", attrs={"name": "description"})
-        description_text = description.get("content", "") if description else ""
-
-        # Extract main heading
-        main_heading = soup.find(["h1", "h2"])
-        main_heading_text = main_heading.get_text(strip=True) if main_heading else ""
+        title_text = self._TITLE_XPATH(tree).strip() or "Untitled"
+        description_text = self._DESCRIPTION_XPATH(tree)
+        main_heading_text = self._MAIN_HEADING_XPATH(tree).strip()
 
         return {
             "title": title_text,
@@ -122,7 +356,7 @@ class BasicSiteScraper:
             "scraped_at": time.time(),
         }
 
-    def _html_to_markdown(self, soup: BeautifulSoup, metadata: dict) -> str:
+    def _html_to_markdown(self, tree: lxml_html.HtmlElement, metadata: dict) -> str:
         """Convert HTML to markdown with basic metadata header."""
         markdown_content = f"""# {metadata['title']}
 
@@ -135,39 +369,60 @@ class BasicSiteScraper:
 
 """
         # Convert main content to markdown
-        main_content = soup.find("main") or soup.find("body") or soup
-
-        content_md = md(
-            str(main_content),
-            heading_style="ATX",
-            bullets="-",
-            strip=["script", "style", "nav", "footer", "header"],
-        )
-
-        markdown_content += content_md
-        return markdown_content
+        main_content = tree.find(".//main")
+        if main_content is None:
+            main_content = tree.find(".//body")
+        if main_content is None:
+            main_content = tree
+
+        return markdown_content + _render_markdown(main_content)
+
+    def _throttle(self) -> None:
+        """Space request starts so each worker waits ``delay`` on average."""
+        interval = self.delay / self.max_workers
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_request_at)
+            self._next_request_at = start_at + interval
+        if start_at > now:
+            time.sleep(start_at - now)
 
     def scrape_page(self, url: str) -> Optional[dict]:
         """Scrape a single page."""
-        if url in self.visited_urls:
-            return None
+        with self._lock:
+            if url in self.visited_urls:
+                return None
+            self.visited_urls.add(url)
+
+        self._throttle()
 
         try:
             logger.info("Scraping: %s", url)
-            response = self.session.get(url, timeout=30)
+            response = self._client.get(url)
             response.raise_for_status()
 
-            # Parse full HTML first to extract links from nav/header/footer too
-            soup_full = BeautifulSoup(response.content, "html.parser")
-            links = self._extract_links(soup_full, url)
+            tree = lxml_html.fromstring(response.content)
 
-            # Clean a copy for markdown/content generation
-            soup = self._clean_html(BeautifulSoup(str(soup_full), "html.parser"))
+            # Extract links before cleaning so nav/header/footer links are kept
+            links = self._extract_links(tree, url)
 
-            metadata = self._extract_metadata(soup, url)
-            markdown_content = self._html_to_markdown(soup, metadata)
+            # Skip cleaning and markdown conversion for pages whose text we
+            # have already seen (pagination, calendar views, URL aliases)
+            digest = hashlib.blake2b(
+                " ".join(tree.text_content().split()).encode(), digest_size=16
+            ).digest()
+            with self._lock:
+                is_duplicate = digest in self._content_digests
+                self._content_digests.add(digest)
+            if is_duplicate:
+                logger.info("Skipping duplicate content: %s", url)
+                return {"url": url, "links": links, "status": "duplicate"}
 
-            self.visited_urls.add(url)
+            # Clean in place for markdown/content generation
+            self._clean_html(tree)
+
+            metadata = self._extract_metadata(tree, url)
+            markdown_content = self._html_to_markdown(tree, metadata)
 
             result = {
                 "url": url,
@@ -182,7 +437,6 @@ class BasicSiteScraper:
 
         except Exception as e:
             logger.error("Error scraping %s: %s", url, e)
-            self.visited_urls.add(url)
             return {
                 "url": url,
                 "metadata": {"title": "Error", "url": url},
@@ -194,26 +448,41 @@ class BasicSiteScraper:
     def scrape_recursive(
         self, start_url: str, current_depth: int = 0
     ) -> dict[str, dict]:
-        """Recursively scrape pages starting from start_url."""
+        """Crawl pages breadth-first starting from start_url.
+
+        Up to ``max_workers`` pages are fetched concurrently. Links are
+        deduplicated when they are queued, so each URL is requested once.
+        """
         if current_depth > self.max_depth:
             return {}
 
         if start_url in self.visited_urls:
             return {}
 
-        # Scrape current page
-        page_result = self.scrape_page(start_url)
-        if not page_result:
-            return {}
-
-        # Add delay between requests
-        time.sleep(self.delay)
-
-        # Recursively scrape linked pages
-        for link in page_result.get("links", []):
-            if link not in self.visited_urls and current_depth < self.max_depth:
-                self.scrape_recursive(link, current_depth + 1)
-                time.sleep(self.delay)
+        frontier: deque[tuple[str, int]] = deque([(start_url, current_depth)])
+        # Pages already scraped or waiting in the frontier; one O(1) check per link
+        with self._lock:
+            visited_or_queued = self.visited_urls | {start_url}
+        in_flight: dict[Future, int] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < self.max_workers:
+                    url, depth = frontier.popleft()
+                    in_flight[executor.submit(self.scrape_page, url)] = depth
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth = in_flight.pop(future)
+                    page_result = future.result()
+                    if not page_result or depth >= self.max_depth:
+                        continue
+
+                    next_depth = depth + 1
+                    for link in page_result.get("links", []):
+                        if link not in visited_or_queued:
+                            visited_or_queued.add(link)
+                            frontier.append((link, next_depth))
 
         return self.scraped_content
 
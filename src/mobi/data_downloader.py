@@ -5,14 +5,23 @@ This module provides functions to scrape and download CSV files containing
 historic bike share trip data from https://www.mobibikes.ca/en/system-data
 """
 
+import hashlib
+import json
+import os
 import re
 import shutil
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
+from typing import Any, BinaryIO, Iterable, Optional
 from urllib.parse import urljoin
 
 import requests
-from bs4 import BeautifulSoup
+import urllib3
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 class MobiDataDownloaderError(Exception):
@@ -21,9 +30,110 @@ class MobiDataDownloaderError(Exception):
     pass
 
 
+def _build_session() -> requests.Session:
+    """Create a pooled HTTP session shared by all downloads in this module."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.3),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Reusing one session keeps connections alive across the listing page and
+# every monthly CSV download instead of reconnecting for each request.
+_SESSION = _build_session()
+
+_MONTH_NAMES = (
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+)
+_MONTH_YEAR_RE = re.compile(rf"({'|'.join(_MONTH_NAMES)})\s+(\d{{4}})", re.IGNORECASE)
+_YEAR_MONTH_RE = re.compile(r"(\d{4})[-_]?(\d{2})")
+_GDRIVE_ID_RE = re.compile(r"/file/d/([^/]+)")
+
+_COPY_BUFFER_SIZE = 1024 * 1024
+_LISTING_CHUNK_SIZE = 64 * 1024
+
+_LISTING_CACHE_NAME = ".system_data_listing.json"
+
+
+def _extract_anchors(chunks: Iterable[bytes]) -> list[tuple[str, str]]:
+    """
+    Return ``(href, text)`` for every ``<a href>`` in an HTML document.
+
+    The document is fed to lxml's pull parser one chunk at a time and the
+    ``<a>`` end events are drained after each chunk, so the page is never
+    held as a single bytes object. Each anchor, and the siblings parsed
+    before it, is released once read.
+    """
+    parser = etree.HTMLPullParser(events=("end",), tag="a")
+    anchors: list[tuple[str, str]] = []
+
+    def drain() -> None:
+        for _, link in parser.read_events():
+            href = link.get("href")
+            if href is not None:
+                anchors.append((href, "".join(link.itertext()).strip()))
+            link.clear(keep_tail=True)
+            while link.getprevious() is not None:
+                del link.getparent()[0]
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        drain()
+    parser.close()
+    drain()
+    return anchors
+
+
+def _load_listing_cache(cache_path: Path, base_url: str) -> Optional[list[dict]]:
+    """Return the file listing saved for ``base_url``, or None if unavailable."""
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("base_url") != base_url:
+        return None
+    files = cached.get("files")
+    return files if isinstance(files, list) else None
+
+
+def _save_listing_cache(
+    cache_path: Path, base_url: str, data_files: list[dict], last_modified: Optional[str]
+) -> None:
+    """Persist a file listing, stamping it with the page's Last-Modified time."""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"base_url": base_url, "files": data_files}, f)
+        if last_modified:
+            mtime = parsedate_to_datetime(last_modified).timestamp()
+            os.utime(cache_path, (mtime, mtime))
+    except (OSError, TypeError, ValueError):
+        # The cache is only an optimization; a failed write just means a full
+        # fetch next time
+        pass
+
+
 def get_available_data_files(
     base_url: str = "https://www.mobibikes.ca/en/system-data",
     timeout: int = 30,
+    cache_path: Optional[Path] = None,
 ) -> list[dict]:
     """
     Scrape the Mobi system data page to find all available CSV download links.
@@ -31,6 +141,9 @@ def get_available_data_files(
     Args:
         base_url: URL of the Mobi system data page
         timeout: Request timeout in seconds
+        cache_path: Optional JSON file holding the last listing. When present,
+            the page is requested with ``If-Modified-Since`` and the cached
+            listing is returned on a 304 response.
 
     Returns:
         List of dicts containing file metadata (url, month, year, filename)
@@ -38,24 +151,35 @@ def get_available_data_files(
     Raises:
         MobiDataDownloaderError: If the page cannot be accessed or parsed
     """
+    cached = None
+    headers = {}
+    if cache_path is not None:
+        cache_path = Path(cache_path)
+        cached = _load_listing_cache(cache_path, base_url)
+        if cached is not None:
+            headers["If-Modified-Since"] = formatdate(cache_path.stat().st_mtime, usegmt=True)
+
     try:
-        response = requests.get(base_url, timeout=timeout)
+        response = _SESSION.get(base_url, timeout=timeout, headers=headers, stream=True)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         raise MobiDataDownloaderError(f"Failed to fetch data page: {e}")
 
-    try:
-        soup = BeautifulSoup(response.content, "html.parser")
-    except Exception as e:
-        raise MobiDataDownloaderError(f"Failed to parse HTML: {e}")
+    with response:
+        if response.status_code == 304 and cached is not None:
+            return cached
+
+        try:
+            links = _extract_anchors(response.iter_content(_LISTING_CHUNK_SIZE))
+        except requests.exceptions.RequestException as e:
+            raise MobiDataDownloaderError(f"Failed to fetch data page: {e}")
+        except Exception as e:
+            raise MobiDataDownloaderError(f"Failed to parse HTML: {e}")
 
     # Find all links that look like data download links
     data_files = []
-    links = soup.find_all("a", href=True)
 
-    for link in links:
-        href = link["href"]
-        link_text = link.get_text(strip=True)
+    for href, link_text in links:
 
         # Look for Google Drive links or direct CSV/ZIP links
         is_gdrive = "drive.google.com" in href
@@ -63,37 +187,18 @@ def get_available_data_files(
 
         if is_gdrive or is_csv_or_zip:
             # Try to parse month and year from link text
-            month_year_match = re.search(
-                r"(January|February|March|April|May|June|July|August|"
-                r"September|October|November|December)\s+(\d{4})",
-                link_text,
-                re.IGNORECASE,
-            )
+            month_year_match = _MONTH_YEAR_RE.search(link_text)
 
             if month_year_match:
                 month = month_year_match.group(1)
                 year = month_year_match.group(2)
             else:
                 # Try to extract from href
-                month_year_match = re.search(r"(\d{4})[-_]?(\d{2})", href)
+                month_year_match = _YEAR_MONTH_RE.search(href)
                 if month_year_match:
                     year = month_year_match.group(1)
                     month_num = month_year_match.group(2)
-                    month_names = [
-                        "January",
-                        "February",
-                        "March",
-                        "April",
-                        "May",
-                        "June",
-                        "July",
-                        "August",
-                        "September",
-                        "October",
-                        "November",
-                        "December",
-                    ]
-                    month = month_names[int(month_num) - 1]
+                    month = _MONTH_NAMES[int(month_num) - 1]
                 else:
                     month = "Unknown"
                     year = "Unknown"
@@ -101,7 +206,7 @@ def get_available_data_files(
             # Convert Google Drive view link to download link
             if is_gdrive and "/file/d/" in href:
                 # Extract file ID from Google Drive link
-                match = re.search(r"/file/d/([^/]+)", href)
+                match = _GDRIVE_ID_RE.search(href)
                 if match:
                     file_id = match.group(1)
                     download_url = (
@@ -126,20 +231,55 @@ def get_available_data_files(
                 }
             )
 
+    if cache_path is not None:
+        _save_listing_cache(
+            cache_path, base_url, data_files, response.headers.get("Last-Modified")
+        )
+
     return data_files
 
 
+class _HashingWriter:
+    """Write-only file wrapper that feeds every block to a running hash."""
+
+    def __init__(self, f: BinaryIO, digest: Any) -> None:
+        self._f = f
+        self._digest = digest
+
+    def write(self, data: bytes) -> int:
+        self._digest.update(data)
+        return self._f.write(data)
+
+
+def _preallocate(fileno: int, content_length: Optional[str]) -> None:
+    """Reserve disk space for a download when the size is known up front."""
+    if not content_length or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fileno, 0, int(content_length))
+    except (OSError, ValueError):
+        # Not supported on every filesystem (e.g. FUSE mounts); writes still work
+        pass
+
+
 def download_file(
     url: str,
     output_path: Path,
     timeout: int = 120,
-    chunk_size: int = 8192,
+    chunk_size: int = _COPY_BUFFER_SIZE,
 ) -> Path:
     """
     Download a file from a URL to the specified output path.
+
+    The file's blake2b digest is computed while streaming and written to a
+    ``<filename>.blake2b`` sidecar next to the download. Data is streamed to
+    a ``<filename>.part`` file that only replaces ``output_path`` once the
+    copy has completed, so a broken transfer never leaves a partial file
+    behind under the final name.
     """
+    part_path = output_path.with_name(output_path.name + ".part")
     try:
-        response = requests.get(url, timeout=timeout, stream=True)
+        response = _SESSION.get(url, timeout=timeout, stream=True)
         response.raise_for_status()
 
         # 🔍 Quick check: skip HTML error/virus-scan pages that pretend to be files
@@ -153,16 +293,30 @@ def download_file(
 
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(output_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                if chunk:
-                    f.write(chunk)
+        digest = hashlib.blake2b(digest_size=16)
+
+        # Let urllib3 undo any gzip/deflate transfer encoding while copying
+        response.raw.decode_content = True
+
+        with open(part_path, "wb") as f:
+            _preallocate(f.fileno(), response.headers.get("Content-Length"))
+            shutil.copyfileobj(response.raw, _HashingWriter(f, digest), length=chunk_size)
+            # Drop any preallocated space beyond what was actually written
+            f.truncate()
+        os.replace(part_path, output_path)
+
+        output_path.with_name(output_path.name + ".blake2b").write_text(
+            digest.hexdigest() + "\n"
+        )
 
         return output_path
 
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+        # Reading response.raw directly surfaces urllib3 errors unwrapped
+        part_path.unlink(missing_ok=True)
         raise MobiDataDownloaderError(f"Failed to download {url}: {e}")
     except IOError as e:
+        part_path.unlink(missing_ok=True)
         raise MobiDataDownloaderError(f"Failed to save file to {output_path}: {e}")
 
 
@@ -171,17 +325,23 @@ def download_all_trip_data(
     output_dir: Path,
     base_url: str = "https://www.mobibikes.ca/en/system-data",
     overwrite: bool = False,
+    max_workers: int = 8,
 ) -> list[Path]:
     """
     Download all available historic trip data CSV files.
 
+    Files are fetched concurrently over the shared session's connection pool.
+    The page listing is cached in ``output_dir`` and revalidated with a
+    conditional request, so unchanged listings are not re-parsed.
+
     Args:
         output_dir: Directory where files should be saved
         base_url: URL of the Mobi system data page
         overwrite: Whether to overwrite existing files
+        max_workers: Number of files to download in parallel
 
     Returns:
-        List of paths to downloaded files
+        List of paths to downloaded files, in listing order
 
     Raises:
         MobiDataDownloaderError: If download fails
@@ -190,33 +350,52 @@ def download_all_trip_data(
     output_dir.mkdir(parents=True, exist_ok=True)
 
     print(f"Finding available data files from {base_url}...")
-    data_files = get_available_data_files(base_url)
+    data_files = get_available_data_files(base_url, cache_path=output_dir / _LISTING_CACHE_NAME)
     print(f"Found {len(data_files)} data file(s)")
 
-    downloaded_files = []
+    total = len(data_files)
+    results: dict[int, Path] = {}
+    pending: list[tuple[int, dict, Path]] = []
+    seen_paths: set[Path] = set()
 
     for i, file_info in enumerate(data_files, 1):
         filename = file_info["filename"]
         output_path = output_dir / filename
 
+        # Undated links all map to the same name; only the first one is
+        # fetched so no two workers ever write the same file
+        if output_path in seen_paths:
+            print(f"[{i}/{total}] Skipping {filename} (duplicate filename)")
+            continue
+        seen_paths.add(output_path)
+
         if output_path.exists() and not overwrite:
-            print(f"[{i}/{len(data_files)}] Skipping {filename} (already exists)")
-            downloaded_files.append(output_path)
+            print(f"[{i}/{total}] Skipping {filename} (already exists)")
+            results[i] = output_path
             continue
 
-        print(
-            f"[{i}/{len(data_files)}] Downloading {filename} "
-            f"({file_info['month']} {file_info['year']})..."
-        )
+        pending.append((i, file_info, output_path))
 
-        try:
-            downloaded_path = download_file(file_info["url"], output_path)
-            downloaded_files.append(downloaded_path)
-            print(f"  ✓ Saved to {downloaded_path}")
-        except MobiDataDownloaderError as e:
-            print(f"  ✗ Failed: {e}")
-            continue
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(download_file, file_info["url"], output_path): (i, file_info)
+            for i, file_info, output_path in pending
+        }
 
+        for future in as_completed(futures):
+            i, file_info = futures[future]
+            label = (
+                f"[{i}/{total}] {file_info['filename']} "
+                f"({file_info['month']} {file_info['year']})"
+            )
+            try:
+                downloaded_path = future.result()
+                results[i] = downloaded_path
+                print(f"{label} ✓ Saved to {downloaded_path}")
+            except MobiDataDownloaderError as e:
+                print(f"{label} ✗ Failed: {e}")
+
+    downloaded_files = [results[i] for i in sorted(results)]
     print(f"\nDownloaded {len(downloaded_files)} file(s) to {output_dir}")
     return downloaded_files
 
@@ -28,6 +28,16 @@ from pyspark.sql import DataFrame, SparkSession
 from pyspark.sql import functions as F
 
 
+def _quote_identifier(name: str) -> str:
+    """Backtick-quote a SQL identifier, doubling any embedded backticks."""
+    return "`" + name.replace("`", "``") + "`"
+
+
+def _quote_literal(text: str) -> str:
+    """Single-quote a SQL string literal using Spark's backslash escaping."""
+    return "'" + text.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
 def _basic_stats_for_column(sdf: DataFrame, col: str) -> Dict:
     total = sdf.count()
     nulls = sdf.filter(F.col(col).isNull() | (F.col(col) == "")).count()
@@ -150,6 +160,50 @@ def summarize_table(spark: SparkSession, catalog: str, schema: str, table: str,
     return results
 
 
+def _apply_comments_batched(spark: SparkSession, full: str, suggestions: List[Dict]) -> bool:
+    """Set every column comment with one ALTER TABLE statement.
+
+    Databricks accepts a comma-separated list of columns in a single
+    ALTER COLUMN clause, so the whole table is one metastore write. Returns
+    False if the statement is rejected (e.g. on older runtimes).
+    """
+    batch_sql = f"ALTER TABLE {full} ALTER COLUMN " + ", ".join(
+        f"{_quote_identifier(s['column'])} COMMENT {_quote_literal(s['suggested_comment'])}"
+        for s in suggestions
+    )
+    try:
+        spark.sql(batch_sql)
+        return True
+    except Exception as e:
+        print(f"Batched ALTER COLUMN failed ({e}); applying comments one column at a time.")
+        return False
+
+
+def _apply_comments_per_column(spark: SparkSession, full: str, suggestions: List[Dict]) -> None:
+    """Set column comments one statement at a time."""
+    for s in suggestions:
+        col = s["column"]
+        # Comment text must be a string literal here (Spark does not accept
+        # parameter markers in COMMENT clauses), but the column identifier is
+        # backtick-quoted so names with spaces or dots resolve correctly.
+        comment = _quote_literal(s["suggested_comment"])
+        quoted_col = _quote_identifier(col)
+        # Use COMMENT ON COLUMN syntax; Databricks supports this form in SQL
+        sql = f"COMMENT ON COLUMN {full}.{quoted_col} IS {comment}"
+        try:
+            spark.sql(sql)
+        except Exception as e:
+            # If COMMENT ON COLUMN fails, try ALTER TABLE ... CHANGE COLUMN ... COMMENT
+            alt_sql = (
+                f"ALTER TABLE {full} CHANGE COLUMN {quoted_col} {quoted_col} "
+                f"{s['dtype']} COMMENT {comment}"
+            )
+            try:
+                spark.sql(alt_sql)
+            except Exception as e2:
+                print(f"Failed to set comment for {col}: {e} / {e2}")
+
+
 def analyze_and_update_table(
     spark: SparkSession,
     catalog: str,
@@ -161,7 +215,9 @@ def analyze_and_update_table(
     """Analyze table and optionally update column comments.
 
     Returns a list of suggestions (column -> suggested_comment).
-    If dry_run is False, attempts to apply comments using `COMMENT ON COLUMN`.
+    If dry_run is False, applies all comments with one multi-column
+    `ALTER TABLE ... ALTER COLUMN` statement, falling back to per-column
+    `COMMENT ON COLUMN` if the batched form is rejected.
     """
     full = f"`{catalog}`.`{schema}`.`{table}`"
     print(f"Analyzing table {full} (sample_limit={sample_limit})...")
@@ -185,20 +241,9 @@ def analyze_and_update_table(
         return suggestions
 
     print("Applying comments to table metadata...")
-    for s in suggestions:
-        col = s["column"]
-        comment = s["suggested_comment"].replace("'", "\'")
-        # Use COMMENT ON COLUMN syntax; Databricks supports this form in SQL
-        sql = f"COMMENT ON COLUMN {full}.{col} IS '{comment}'"
-        try:
-            spark.sql(sql)
-        except Exception as e:
-            # If COMMENT ON COLUMN fails, try ALTER TABLE ... CHANGE COLUMN ... COMMENT
-            alt_sql = f"ALTER TABLE {full} CHANGE COLUMN `{col}` `{col}` {s['stats'].get('dtype', 'STRING')} COMMENT '{comment}'"
-            try:
-                spark.sql(alt_sql)
-            except Exception as e2:
-                print(f"Failed to set comment for {col}: {e} / {e2}")
+    to_apply = [s for s in suggestions if s["suggested_comment"]]
+    if to_apply and not _apply_comments_batched(spark, full, to_apply):
+        _apply_comments_per_column(spark, full, to_apply)
     print("Done applying comments.")
     return suggestions
 
@@ -14,10 +14,175 @@ Behavior goals:
 """
 from __future__ import annotations
 
+import functools
 import re
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pyspark.errors import AnalysisException
+from pyspark.sql import DataFrame, SparkSession
+
+try:
+    import hyperscan
+except ImportError:  # optional: `pip install mobi[fast]`
+    hyperscan = None
+
+# Compiled once at import; intent detection is nothing but these scans.
+_STATION_RE = re.compile(r"station\s*(\d{2,})")
+_COORDS_RE = re.compile(r"(-?\d+\.\d+)")
+# Intent keyword groups, scanned for together in one pass over the message.
+_INTENT_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    ("live_status", r"available|availability|bikes at station"),
+    ("recent", r"recent"),
+    ("trip", r"trip"),
+    ("nearby", r"near|closest"),
+)
+# All intent keywords in one alternation; a single finditer pass reports
+# which intents a message mentions via the name of the matching group.
+_INTENT_RE = re.compile("|".join(f"(?P<{name}>{pat})" for name, pat in _INTENT_PATTERNS))
+
+# Argument types for which a numeric station id is bound as an integer.
+_INT_TYPES = frozenset({"TINYINT", "SMALLINT", "INT", "INTEGER", "BIGINT"})
+
+# Tool queries. Every value is a named parameter, so the text never changes
+# between calls and is passed to spark.sql() as-is.
+_SQL_LIVE = (
+    "SELECT station_id, num_bikes_available, num_docks_available, is_renting, is_returning "
+    "FROM vanhack.mobi_data.live_station_status(:station_id) LIMIT 1"
+)
+_SQL_NEARBY_ALL = (
+    "SELECT station_id, station_name, ROUND(distance_km, 3) AS distance_km "
+    "FROM vanhack.mobi_data.nearby_stations(:lat, :lon, :radius_km) "
+    "ORDER BY distance_km"
+)
+_SQL_NEARBY = _SQL_NEARBY_ALL + " LIMIT :lim"
+_SQL_RECENT_TRIPS = (
+    "SELECT trip_id, departure_time, duration_sec "
+    "FROM vanhack.mobi_data.recent_trips_by_station(:station_id) LIMIT :lim"
+)
+# One UNION ALL branch per station in the batch callers; {i} is the request index.
+_SQL_LIVE_BRANCH = (
+    "(SELECT {i} AS req_idx, station_id, num_bikes_available, num_docks_available, "
+    "is_renting, is_returning FROM vanhack.mobi_data.live_station_status(:sid{i}) LIMIT 1)"
+)
+_SQL_RECENT_TRIPS_BRANCH = (
+    "(SELECT {i} AS req_idx, trip_id, departure_time, duration_sec "
+    "FROM vanhack.mobi_data.recent_trips_by_station(:sid{i}) LIMIT :lim)"
+)
+_HINT_CHECK_SIGNATURE = "Check function signature with SHOW/DESCRIBE in Databricks."
+_HINT_INSPECT_SIGNATURE = "Inspect function signature with DESCRIBE/SHOW in Databricks."
+
+
+def _build_intent_db() -> Any:
+    """Compile the intent patterns into a Hyperscan database, if available.
+
+    Returns None (so the compiled regex is used) when hyperscan is missing or
+    can't compile or allocate scratch space on this machine, e.g. a broken
+    wheel or an unsupported CPU.
+    """
+    if hyperscan is None:
+        return None
+    try:
+        db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        db.compile(
+            expressions=[pat.encode() for _, pat in _INTENT_PATTERNS],
+            ids=list(range(len(_INTENT_PATTERNS))),
+            elements=len(_INTENT_PATTERNS),
+            flags=hyperscan.HS_FLAG_SINGLEMATCH,
+        )
+        hyperscan.Scratch(db)
+    except Exception:
+        return None
+    return db
+
+
+_INTENT_DB = _build_intent_db()
+# Hyperscan scratch space must not be shared between concurrent scans
+_SCRATCH = threading.local()
+
+
+def _regex_intent_hits(text: str) -> Set[str]:
+    """Intent keyword groups found by the compiled alternation."""
+    return {m.lastgroup for m in _INTENT_RE.finditer(text)}
+
+
+def _intent_hits(text: str) -> Set[str]:
+    """Return the names of the intent keyword groups that occur in `text`."""
+    if _INTENT_DB is None:
+        return _regex_intent_hits(text)
+
+    hits: Set[str] = set()
 
-from pyspark.sql import SparkSession
+    def on_match(pattern_id: int, start: int, end: int, flags: int, context: Any) -> None:
+        hits.add(_INTENT_PATTERNS[pattern_id][0])
+
+    try:
+        scratch = getattr(_SCRATCH, "scratch", None)
+        if scratch is None:
+            scratch = _SCRATCH.scratch = hyperscan.Scratch(_INTENT_DB)
+        _INTENT_DB.scan(text.encode(), match_event_handler=on_match, scratch=scratch)
+    except Exception:
+        return _regex_intent_hits(text)
+    return hits
+
+
+# ---- intent parsing -----------------------------------------------
+def _parse_station_id(text: str) -> Optional[str]:
+    # A plain substring test is far cheaper than the regex and rules out
+    # most messages that never mention a station
+    if "station" not in text:
+        return None
+    m = _STATION_RE.search(text)
+    if m:
+        return m.group(1)
+    return None
+
+
+def _parse_coords(text: str) -> Optional[Tuple[float, float]]:
+    # Find two floats (lat, lon); without a decimal point there are none
+    if "." not in text:
+        return None
+    coords = _COORDS_RE.findall(text)
+    if len(coords) >= 2:
+        return float(coords[0]), float(coords[1])
+    return None
+
+
+@functools.lru_cache(maxsize=512)
+def _detect_intent(text: str) -> Tuple[str, Tuple[Tuple[str, Any], ...]]:
+    """Classify a message, memoized on the raw text.
+
+    Params come back as a tuple of items so the result is hashable and
+    shared cache entries can't be mutated; callers rebuild a dict from it.
+    """
+    t = text.lower().strip()
+    hits = _intent_hits(t)
+
+    wants_live = "live_status" in hits
+    wants_trips = "recent" in hits and "trip" in hits
+    # Parse the station id once and share it between the two station intents
+    station = _parse_station_id(t) if wants_live or wants_trips else None
+
+    if station:
+        # live status
+        if wants_live:
+            return "live_status", (("station_id", station),)
+
+        # recent trips
+        if wants_trips:
+            return "recent_trips", (("station_id", station),)
+
+    # nearby
+    if "nearby" in hits:
+        coords = _parse_coords(t)
+        if coords:
+            return "nearby", (("lat", coords[0]), ("lon", coords[1]), ("radius_km", 1.0))
+
+    # docs / faq questions and anything unrecognised: show help locally,
+    # without touching Spark
+    return "help", ()
 
 
 class DatabricksAgent:
@@ -25,7 +190,7 @@ class DatabricksAgent:
 
     Example usage (Databricks notebook):
 
-    >>> agent = DatabricksAgent(spark)
+    >>> agent = DatabricksAgent(spark)  # or get_default_agent(spark)
     >>> agent.query("Are there bikes available at station 0152?")
     {
       "intent": "live_status",
@@ -35,27 +200,46 @@ class DatabricksAgent:
     }
     """
 
-    def __init__(self, spark: SparkSession, catalog: str = "vanhack"):
+    def __init__(
+        self,
+        spark: SparkSession,
+        catalog: str = "vanhack",
+        function_cache_ttl: Optional[float] = None,
+    ):
         """Create an agent bound to a SparkSession.
 
         Args:
             spark: active SparkSession
             catalog: Unity Catalog name to USE (defaults to 'vanhack')
+            function_cache_ttl: seconds before the cached function list is
+                re-read from Unity Catalog (None keeps it for the agent's lifetime)
         """
         self.spark = spark
         self.catalog = catalog
-        # Ensure we are using the right catalog for resolution
+        self.function_cache_ttl = function_cache_ttl
+        # Metadata state is filled in lazily by the first tool call and then
+        # reused, so one agent can serve many queries without repeating it.
+        self._catalog_ready = False
+        # Fully-qualified function names in vanhack.mobi_data
+        self._func_cache: Optional[set[str]] = None
+        self._func_cache_loaded_at = 0.0
+        # Function name -> SQL type of its first argument (from DESCRIBE FUNCTION)
+        self._fn_sig: Dict[str, str] = {}
+
+    def _ensure_catalog(self) -> None:
+        """Switch the session to `self.catalog` once, before the first tool call."""
+        if self._catalog_ready:
+            return
+        self._catalog_ready = True
+        # Ensure we are using the right catalog for resolution; checking the
+        # current catalog first skips a SQL round trip when it's already set
         try:
-            self.spark.sql(f"USE CATALOG {self.catalog}")
+            if self.spark.catalog.currentCatalog() != self.catalog:
+                self.spark.sql(f"USE CATALOG {self.catalog}")
         except Exception:
             # ignore errors here; callers can still run fully-qualified names
             pass
 
-    @staticmethod
-    def _escape_literal(value: str) -> str:
-        """Very small helper to escape single quotes for SQL string literals."""
-        return value.replace("'", "''")
-
     @staticmethod
     def _format_missing_function_hint(function_name: str) -> Dict[str, Any]:
         return {
@@ -70,17 +254,88 @@ class DatabricksAgent:
         """Check Unity Catalog for a function with this name in vanhack.mobi_data.
 
         Returns True if a function with the exact name is present. This helps
-        give better errors when signatures don't match.
+        give better errors when signatures don't match. The function list is
+        fetched once and then looked up in a set; it is re-read after
+        `function_cache_ttl` seconds (if set) or after `refresh_functions()`.
         """
+        expired = (
+            self.function_cache_ttl is not None
+            and time.monotonic() - self._func_cache_loaded_at > self.function_cache_ttl
+        )
+        if self._func_cache is None or expired:
+            self._ensure_catalog()
+            try:
+                df = self.spark.sql("SHOW FUNCTIONS IN vanhack.mobi_data")
+                self._func_cache = {r.function for r in df.collect() if hasattr(r, "function")}
+                self._func_cache_loaded_at = time.monotonic()
+                # Signatures may have changed along with the function list
+                self._fn_sig.clear()
+            except Exception:
+                # If SHOW FUNCTIONS fails, keep answering from the previous
+                # list (the next call retries the refresh). With no list at
+                # all, return False and let the caller surface the error.
+                if self._func_cache is None:
+                    return False
+        return f"vanhack.mobi_data.{function_name}" in self._func_cache
+
+    def refresh_functions(self) -> None:
+        """Forget the cached function list so the next lookup re-reads Unity Catalog."""
+        self._func_cache = None
+        self._fn_sig.clear()
+
+    def _first_arg_type(self, function_name: str) -> str:
+        """Return the declared type of a function's first argument, e.g. 'STRING'.
+
+        Read once per function from DESCRIBE FUNCTION EXTENDED and cached with
+        the function list. Falls back to 'STRING' if the description can't be
+        read or parsed.
+        """
+        if function_name not in self._fn_sig:
+            arg_type = "STRING"
+            try:
+                rows = self.spark.sql(
+                    f"DESCRIBE FUNCTION EXTENDED vanhack.mobi_data.{function_name}"
+                ).collect()
+                for r in rows:
+                    line = str(r[0]).strip()
+                    if line.lower().startswith("input:"):
+                        parts = line.split()
+                        if len(parts) >= 3:
+                            arg_type = parts[2].upper()
+                        break
+            except Exception:
+                pass
+            self._fn_sig[function_name] = arg_type
+        return self._fn_sig[function_name]
+
+    def _station_sql(
+        self, function_name: str, sql: str, stations: Dict[str, str], **args: Any
+    ) -> DataFrame:
+        """Run a query whose station-id parameters are given by `stations`.
+
+        `stations` maps parameter names (e.g. "station_id", "sid0") to station
+        ids. Numeric ids are bound as integers when the function declares an
+        integer argument, so one SQL call normally suffices. Only an
+        AnalysisException (the function rejected the argument type) triggers
+        a single retry with the other binding; the working type is then
+        remembered. Any other failure propagates to the caller.
+        """
+
+        def bind(as_int: bool) -> Dict[str, Any]:
+            return {
+                name: int(sid) if as_int and sid.isdigit() else sid
+                for name, sid in stations.items()
+            }
+
+        as_int = self._first_arg_type(function_name) in _INT_TYPES
         try:
-            df = self.spark.sql("SHOW FUNCTIONS IN vanhack.mobi_data")
-            names = [r.function for r in df.collect() if hasattr(r, "function")]
-            full_name = f"vanhack.mobi_data.{function_name}"
-            return full_name in names
-        except Exception:
-            # If SHOW FUNCTIONS fails for some reason, return False and let
-            # the caller surface the original error.
-            return False
+            return self.spark.sql(sql, args={**bind(as_int), **args})
+        except AnalysisException:
+            if not any(sid.isdigit() for sid in stations.values()):
+                raise
+            df = self.spark.sql(sql, args={**bind(not as_int), **args})
+            self._fn_sig[function_name] = "STRING" if as_int else "BIGINT"
+            return df
 
     # ---- low-level callers for the deployed tools -----------------
     def _call_live_status(self, station_id: str) -> Optional[Dict[str, Any]]:
@@ -89,14 +344,12 @@ class DatabricksAgent:
         if not self._function_exists(fn):
             return self._format_missing_function_hint(fn)
 
-        safe_station = self._escape_literal(station_id)
-        # Use the correct syntax for table-valued functions in Databricks
-        sql = f"SELECT * FROM vanhack.mobi_data.{fn}('{safe_station}')"
-        
+        # Values are bound as named parameters so the SQL text stays the same
+        # across stations and no manual escaping is needed.
         try:
-            df = self.spark.sql(sql)
-            rows = [r.asDict() for r in df.collect()]
-            return rows[0] if rows else None
+            df = self._station_sql(fn, _SQL_LIVE, {"station_id": station_id})
+            rows = df.take(1)
+            return rows[0].asDict() if rows else None
         except Exception as e:
             msg = str(e)
             return {
@@ -104,24 +357,34 @@ class DatabricksAgent:
                 "hint": (
                     "Function exists but may have failed. "
                     "In a Databricks notebook run:\n"
-                    "  spark.sql(\"DESCRIBE FUNCTION EXTENDED vanhack.mobi_data.live_station_status\").show()\n"
+                    "  spark.sql(\"DESCRIBE FUNCTION EXTENDED "
+                    "vanhack.mobi_data.live_station_status\").show()\n"
                     "to inspect signatures."
                 ),
             }
 
-    def _call_nearby(self, lat: float, lon: float, radius_km: float = 1.0) -> List[Dict[str, Any]]:
+    def _call_nearby(
+        self, lat: float, lon: float, radius_km: float = 1.0, limit: Optional[int] = 25
+    ) -> List[Dict[str, Any]]:
         # FIXED: Remove TABLE() wrapper
         fn = "nearby_stations"
         if not self._function_exists(fn):
             return [self._format_missing_function_hint(fn)]
 
-        sql = f"SELECT * FROM vanhack.mobi_data.{fn}({lat:.6f}, {lon:.6f}, {radius_km:.6f})"
-        
+        # Round in SQL so only display-ready values come back to the driver
+        args: Dict[str, Any] = {"lat": float(lat), "lon": float(lon), "radius_km": float(radius_km)}
+        sql = _SQL_NEARBY_ALL
+        if limit is not None:
+            sql = _SQL_NEARBY
+            args["lim"] = int(limit)
+
         try:
-            df = self.spark.sql(sql)
-            return [r.asDict() for r in df.collect()]
+            df = self.spark.sql(sql, args=args)
+            # Stream rows partition by partition; with limit=None the result
+            # is unbounded and shouldn't be collected in one piece
+            return [r.asDict() for r in df.toLocalIterator()]
         except Exception as e:
-            return [{"error": str(e), "hint": "Check function signature with SHOW/DESCRIBE in Databricks."}]
+            return [{"error": str(e), "hint": _HINT_CHECK_SIGNATURE}]
 
     def _call_recent_trips(self, station_id: str, limit: int = 5) -> List[Dict[str, Any]]:
         # FIXED: Remove TABLE() wrapper
@@ -129,92 +392,132 @@ class DatabricksAgent:
         if not self._function_exists(fn):
             return [self._format_missing_function_hint(fn)]
 
-        safe_station = self._escape_literal(station_id)
-        sql = f"SELECT * FROM vanhack.mobi_data.{fn}('{safe_station}') LIMIT {int(limit)}"
-        
         try:
-            df = self.spark.sql(sql)
-            return [r.asDict() for r in df.collect()]
+            limit = int(limit)
+            df = self._station_sql(fn, _SQL_RECENT_TRIPS, {"station_id": station_id}, lim=limit)
+            # take() lets Spark stop scanning partitions once `limit` rows are in
+            return [r.asDict() for r in df.take(limit)]
         except Exception as e:
-            return [{"error": str(e), "hint": "Inspect function signature with DESCRIBE/SHOW in Databricks."}]
+            return [{"error": str(e), "hint": _HINT_INSPECT_SIGNATURE}]
 
-    # ---- intent parsing -------------------------------------------
-    def _parse_station_id(self, text: str) -> Optional[str]:
-        m = re.search(r"station\s*(\d{2,})", text)
-        if m:
-            return m.group(1)
-        return None
+    def _call_live_status_many(self, station_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Look up live status for several stations in one UNION ALL query.
 
-    def _parse_coords(self, text: str) -> Optional[Tuple[float, float]]:
-        # Find two floats (lat, lon)
-        coords = re.findall(r"(-?\d+\.\d+)", text)
-        if len(coords) >= 2:
-            return float(coords[0]), float(coords[1])
-        return None
+        Returns a mapping of station id to the same value `_call_live_status`
+        would return for it.
+        """
+        fn = "live_station_status"
+        if not self._function_exists(fn):
+            hint = self._format_missing_function_hint(fn)
+            return {sid: hint for sid in station_ids}
+        if len(station_ids) == 1:
+            return {station_ids[0]: self._call_live_status(station_ids[0])}
+
+        # One branch per station; req_idx maps result rows back to the request
+        sql = " UNION ALL ".join(
+            _SQL_LIVE_BRANCH.format(i=i) for i in range(len(station_ids))
+        )
+        stations = {f"sid{i}": sid for i, sid in enumerate(station_ids)}
 
-    def _detect_intent(self, text: str) -> Tuple[str, Dict[str, Any]]:
-        t = text.lower().strip()
-        # live status
-        if any(k in t for k in ("available", "availability", "bikes available", "bikes at station")):
-            station = self._parse_station_id(t)
-            if station:
-                return "live_status", {"station_id": station}
+        try:
+            rows = self._station_sql(fn, sql, stations).collect()
+        except Exception as e:
+            error = {"error": str(e), "hint": _HINT_CHECK_SIGNATURE}
+            return {sid: error for sid in station_ids}
+
+        results: Dict[str, Optional[Dict[str, Any]]] = {sid: None for sid in station_ids}
+        for r in rows:
+            row = r.asDict()
+            results[station_ids[row.pop("req_idx")]] = row
+        return results
+
+    def _call_recent_trips_many(
+        self, station_ids: List[str], limit: int = 5
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Fetch recent trips for several stations in one UNION ALL query."""
+        fn = "recent_trips_by_station"
+        if not self._function_exists(fn):
+            hint = self._format_missing_function_hint(fn)
+            return {sid: [hint] for sid in station_ids}
+        if len(station_ids) == 1:
+            return {station_ids[0]: self._call_recent_trips(station_ids[0], limit=limit)}
 
-        # recent trips
-        if "recent trips" in t or ("recent" in t and "trip" in t):
-            station = self._parse_station_id(t)
-            if station:
-                return "recent_trips", {"station_id": station}
+        sql = " UNION ALL ".join(
+            _SQL_RECENT_TRIPS_BRANCH.format(i=i) for i in range(len(station_ids))
+        )
+        stations = {f"sid{i}": sid for i, sid in enumerate(station_ids)}
 
-        # nearby
-        if any(k in t for k in ("near", "nearby", "closest")):
-            coords = self._parse_coords(t)
-            if coords:
-                return "nearby", {"lat": coords[0], "lon": coords[1], "radius_km": 1.0}
+        try:
+            df = self._station_sql(fn, sql, stations, lim=int(limit))
+            rows = [r.asDict() for r in df.collect()]
+        except Exception as e:
+            error = {"error": str(e), "hint": _HINT_INSPECT_SIGNATURE}
+            return {sid: [error] for sid in station_ids}
 
-        # docs / faq: return help instead
-        if t.endswith("?") or any(k in t for k in ("how to", "how do i", "what is", "pricing", "fare", "policy")):
-            return "help", {}
+        results: Dict[str, List[Dict[str, Any]]] = {sid: [] for sid in station_ids}
+        for row in rows:
+            results[station_ids[row.pop("req_idx")]].append(row)
+        return results
 
-        # fallback: show help
-        return "help", {}
+    # ---- response formatting --------------------------------------
+    @staticmethod
+    def _live_status_response(
+        params: Dict[str, Any], res: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        intent = "live_status"
+        if res is None:
+            answer = f"No live status found for station {params['station_id']}"
+            return {"intent": intent, "params": params, "answer": answer, "raw": None}
+        if "error" in res:
+            answer = "Error calling live status"
+            return {"intent": intent, "params": params, "answer": answer, "raw": res}
+        txt = (
+            f"Station {res.get('station_id')}: bikes={res.get('num_bikes_available')}, "
+            f"docks={res.get('num_docks_available')}, renting={res.get('is_renting')}, "
+            f"returning={res.get('is_returning')}"
+        )
+        return {"intent": intent, "params": params, "answer": txt, "raw": res}
 
-    # ---- public API -----------------------------------------------
-    def query(self, message: str) -> Dict[str, Any]:
-        """Handle a user message and return a structured response.
+    @staticmethod
+    def _recent_trips_response(
+        params: Dict[str, Any], rows: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        intent = "recent_trips"
+        if rows and isinstance(rows, list) and "error" in rows[0]:
+            answer = "Error fetching recent trips"
+            return {"intent": intent, "params": params, "answer": answer, "raw": rows}
+        if not rows:
+            answer = f"No recent trips for station {params['station_id']}"
+            return {"intent": intent, "params": params, "answer": answer, "raw": rows}
+        body = "\n".join(
+            f"{r.get('trip_id')} | dep: {r.get('departure_time')} | dur: {r.get('duration_sec')}s"
+            for r in rows
+        )
+        return {"intent": intent, "params": params, "answer": f"Recent trips:\n{body}", "raw": rows}
 
-        Returns a dict with keys: intent, params, answer (human-friendly), raw (tool output)
-        """
-        intent, params = self._detect_intent(message)
+    def _respond(self, intent: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the tool for an already-detected intent and format the answer."""
         if intent == "live_status":
-            res = self._call_live_status(params["station_id"])
-            if res is None:
-                return {"intent": intent, "params": params, "answer": f"No live status found for station {params['station_id']}", "raw": None}
-            if "error" in res:
-                return {"intent": intent, "params": params, "answer": "Error calling live status", "raw": res}
-            txt = (
-                f"Station {res.get('station_id')}: bikes={res.get('num_bikes_available')}, "
-                f"docks={res.get('num_docks_available')}, renting={res.get('is_renting')}, returning={res.get('is_returning')}"
-            )
-            return {"intent": intent, "params": params, "answer": txt, "raw": res}
+            return self._live_status_response(params, self._call_live_status(params["station_id"]))
 
         if intent == "recent_trips":
             rows = self._call_recent_trips(params["station_id"], limit=5)
-            if rows and isinstance(rows, list) and "error" in rows[0]:
-                return {"intent": intent, "params": params, "answer": "Error fetching recent trips", "raw": rows}
-            if not rows:
-                return {"intent": intent, "params": params, "answer": f"No recent trips for station {params['station_id']}", "raw": rows}
-            lines = [f"{r.get('trip_id')} | dep: {r.get('departure_time')} | dur: {r.get('duration_sec')}s" for r in rows]
-            return {"intent": intent, "params": params, "answer": "Recent trips:\n" + "\n".join(lines), "raw": rows}
+            return self._recent_trips_response(params, rows)
 
         if intent == "nearby":
             rows = self._call_nearby(params["lat"], params["lon"], params.get("radius_km", 1.0))
             if rows and isinstance(rows, list) and "error" in rows[0]:
-                return {"intent": intent, "params": params, "answer": "Error calling nearby_stations", "raw": rows}
+                answer = "Error calling nearby_stations"
+                return {"intent": intent, "params": params, "answer": answer, "raw": rows}
             if not rows:
-                return {"intent": intent, "params": params, "answer": "No stations found nearby.", "raw": rows}
-            lines = [f"{r.get('station_id')}: {r.get('station_name')} ({round(r.get('distance_km', 0),3)} km)" for r in rows]
-            return {"intent": intent, "params": params, "answer": "Nearby stations:\n" + "\n".join(lines), "raw": rows}
+                answer = "No stations found nearby."
+                return {"intent": intent, "params": params, "answer": answer, "raw": rows}
+            # distance_km is already rounded in SQL, so it is rendered as-is
+            body = "\n".join(
+                f"{r['station_id']}: {r['station_name']} ({r['distance_km']} km)" for r in rows
+            )
+            answer = f"Nearby stations:\n{body}"
+            return {"intent": intent, "params": params, "answer": answer, "raw": rows}
 
         # help
         help_text = (
@@ -226,9 +529,69 @@ class DatabricksAgent:
         )
         return {"intent": "help", "params": {}, "answer": help_text, "raw": None}
 
+    # ---- public API -----------------------------------------------
+    def query(self, message: str) -> Dict[str, Any]:
+        """Handle a user message and return a structured response.
+
+        Returns a dict with keys: intent, params, answer (human-friendly), raw (tool output)
+        """
+        intent, params = _detect_intent(message)
+        return self._respond(intent, dict(params))
+
+    def query_many(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """Handle several messages, batching station lookups.
+
+        All live-status messages are answered from one UNION ALL query, and
+        likewise all recent-trips messages, instead of one Spark job per
+        message. Other intents are handled as in `query()`. Responses are
+        returned in the same order as `messages`.
+        """
+        parsed = [(intent, dict(params)) for intent, params in map(_detect_intent, messages)]
+
+        def station_ids(wanted: str) -> List[str]:
+            return list(dict.fromkeys(p["station_id"] for i, p in parsed if i == wanted))
+
+        live_ids = station_ids("live_status")
+        trip_ids = station_ids("recent_trips")
+        live = self._call_live_status_many(live_ids) if live_ids else {}
+        trips = self._call_recent_trips_many(trip_ids, limit=5) if trip_ids else {}
+
+        responses = []
+        for intent, params in parsed:
+            if intent == "live_status":
+                responses.append(self._live_status_response(params, live[params["station_id"]]))
+            elif intent == "recent_trips":
+                responses.append(self._recent_trips_response(params, trips[params["station_id"]]))
+            else:
+                responses.append(self._respond(intent, params))
+        return responses
+
+
+# Shared agents per SparkSession, then per catalog. Entries go away with
+# their session: the cached agents reach the session only through a weak
+# proxy, so they don't keep their own key alive.
+_DEFAULT_AGENTS: weakref.WeakKeyDictionary[SparkSession, Dict[str, DatabricksAgent]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_default_agent(spark: SparkSession, catalog: str = "vanhack") -> DatabricksAgent:
+    """Return a shared DatabricksAgent for this SparkSession.
+
+    Notebook cells can call `get_default_agent(spark).query(...)` repeatedly
+    and keep the warm catalog and function-list state between calls instead
+    of constructing a cold agent each time. The shared agent does not keep
+    the session alive; it stops working once the session is released.
+    """
+    agents = _DEFAULT_AGENTS.setdefault(spark, {})
+    agent = agents.get(catalog)
+    if agent is None:
+        agent = agents[catalog] = DatabricksAgent(weakref.proxy(spark), catalog=catalog)
+    return agent
+
 
 def demo(spark: SparkSession):
-    agent = DatabricksAgent(spark)
+    agent = get_default_agent(spark)
     queries = [
         "Are there bikes available at station 0152?",
         "Find stations near 49.2827, -123.1207",
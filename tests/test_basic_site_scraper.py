@@ -0,0 +1,262 @@
+"""Unit tests for BasicSiteScraper HTML cleaning, Markdown rendering, URL filtering and crawling."""
+
+import threading
+import time
+
+import httpx
+import pytest
+from lxml import html as lxml_html
+
+from mobi import basic_site_scraper
+from mobi.basic_site_scraper import BasicSiteScraper, _render_markdown
+
+
+def render(fragment: str) -> str:
+    """Render an HTML fragment wrapped in a <div>."""
+    return _render_markdown(lxml_html.fragment_fromstring(fragment, create_parent="div"))
+
+
+def page(body: str, *links: str) -> str:
+    """Build an HTML page with the given body text and links."""
+    anchors = "".join(f"<a href='{link}'>more</a>" for link in links)
+    return f"<html><body><p>{body}</p>{anchors}</body></html>"
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping advances the clock instantly."""
+
+    def __init__(self) -> None:
+        self.now = 100.0
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeSite:
+    """Serves pages through httpx.MockTransport and records every request."""
+
+    def __init__(self, pages: dict[str, str]) -> None:
+        self.pages = pages
+        self.requests: list[tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.requests.append((request.url.path, time.monotonic()))
+        html = self.pages.get(request.url.path)
+        if html is None:
+            return httpx.Response(404)
+        return httpx.Response(200, html=html)
+
+    def paths(self) -> list[str]:
+        return sorted(path for path, _ in self.requests)
+
+    def scraper(self, **kwargs: object) -> BasicSiteScraper:
+        scraper = BasicSiteScraper("https://mobibikes.ca/", **{"delay": 0, **kwargs})
+        scraper._client = httpx.Client(transport=httpx.MockTransport(self.handler))
+        return scraper
+
+
+class TestRenderMarkdown:
+    """HTML-to-Markdown conversion."""
+
+    def test_headings(self) -> None:
+        """Test headings become ATX headings with their inline markup."""
+        assert render("<h1>Title</h1><h3>Sub <em>part</em></h3>") == "# Title\n\n### Sub *part*"
+
+    def test_nested_lists(self) -> None:
+        """Test bullets, numbering and indentation of nested lists."""
+        html = (
+            "<ul><li>One</li><li>Two<ul><li>Inner a</li><li>Inner b</li></ul></li></ul>"
+            "<ol><li>First</li><li>Second</li></ol>"
+        )
+
+        assert render(html) == "- One\n- Two\n  - Inner a\n  - Inner b\n\n1. First\n2. Second"
+
+    def test_table(self) -> None:
+        """Test the first row becomes the header and short rows are padded."""
+        html = (
+            "<table><tr><th>Name</th><th>Docks</th></tr>"
+            "<tr><td>Main St</td><td>12</td></tr><tr><td>Short</td></tr></table>"
+        )
+
+        assert render(html) == "| Name | Docks |\n| --- | --- |\n| Main St | 12 |\n| Short |  |"
+
+    def test_line_break(self) -> None:
+        """Test <br> becomes a Markdown hard line break."""
+        assert render("<p>Line one<br>Line two</p>") == "Line one  \nLine two"
+
+    def test_inline_emphasis_spacing(self) -> None:
+        """Test whitespace inside emphasis moves outside the markers."""
+        html = (
+            "<p>Rent a<strong> bike </strong>today and <em>ride</em>, "
+            "see <a href='/faq'>the FAQ</a>.</p>"
+        )
+
+        assert render(html) == "Rent a **bike** today and *ride*, see [the FAQ](/faq)."
+
+    def test_skipped_tags_keep_tail_text(self) -> None:
+        """Test skipped elements are dropped but the text after them is kept."""
+        html = "<p>Before<script>alert(1)</script> after</p><nav>menu</nav>tail text"
+
+        assert render(html) == "Before after\n\ntail text"
+
+    def test_quote_code_rule_and_image(self) -> None:
+        """Test block quotes, preformatted text, rules, images and inline code."""
+        html = (
+            "<blockquote><p>Quote</p></blockquote><pre>a\n  b</pre><hr>"
+            "<p><img src='x.png' alt='Map'> <code>x=1</code></p>"
+        )
+
+        assert render(html) == "> Quote\n\n```\na\n  b\n```\n\n---\n\n![Map](x.png) `x=1`"
+
+    def test_block_content_inside_link(self) -> None:
+        """Test block children of an inline element are separated, not run together."""
+        html = "<a href='/x'><div>Card title</div><p>desc</p></a>"
+
+        assert render(html) == "[Card title desc](/x)"
+
+    def test_line_break_in_heading(self) -> None:
+        """Test <br> inside a heading becomes a space so the heading stays on one line."""
+        assert render("<h2>Title<br>Sub</h2><p>Body</p>") == "## Title Sub\n\nBody"
+
+    def test_escapes_metacharacters(self) -> None:
+        """Test literal * and _ in text are escaped, but not inside code spans."""
+        html = "<p>2*3 = 6, snake_case <strong>a_b</strong> <code>x_y*z</code></p>"
+
+        assert render(html) == r"2\*3 = 6, snake\_case **a\_b** `x_y*z`"
+
+    def test_table_cell_pipes_and_breaks(self) -> None:
+        """Test pipes in cells are escaped and line breaks keep the row on one line."""
+        html = "<table><tr><th>Plan</th></tr><tr><td>Day | Month<br>pass</td></tr></table>"
+
+        assert render(html) == "| Plan |\n| --- |\n| Day \\| Month pass |"
+
+
+class TestCleanHtml:
+    """Removal of layout elements before rendering."""
+
+    def test_strips_layout_comments_and_empty_paragraphs(self) -> None:
+        """Test layout blocks, scripts, comments and blank paragraphs go, tails stay."""
+        tree = lxml_html.fromstring(
+            "<html><body><header>Top</header><p>Keep</p><!-- note --><p>  </p>"
+            "<footer>Foot</footer>after<script>x()</script>tail</body></html>"
+        )
+
+        BasicSiteScraper("https://mobibikes.ca/")._clean_html(tree)
+
+        assert lxml_html.tostring(tree) == b"<html><body><p>Keep</p>aftertail</body></html>"
+
+
+class TestIsValidUrl:
+    """The single-regex URL filter."""
+
+    @pytest.fixture
+    def scraper(self) -> BasicSiteScraper:
+        return BasicSiteScraper("https://mobibikes.ca/")
+
+    @pytest.mark.parametrize(
+        ("url", "expected"),
+        [
+            ("https://mobibikes.ca/en/faq", True),
+            ("https://mobibikes.ca/apiary", True),
+            ("https://mobibikes.ca/a.PDF", False),
+            ("https://mobibikes.ca/img/x.jpeg", False),
+            ("https://mobibikes.ca/styles/site.css", False),
+            ("https://mobibikes.ca/api/v1", False),
+            ("https://mobibikes.ca/en/login", False),
+            ("https://mobibikes.ca/admin/users", False),
+            ("https://shop.mobibikes.ca/x", False),
+        ],
+    )
+    def test_filter(self, scraper: BasicSiteScraper, url: str, expected: bool) -> None:
+        """Test file types, blocked paths and other hosts are rejected."""
+        assert scraper._is_valid_url(url) is expected
+
+
+class TestScrapeRecursive:
+    """The concurrent breadth-first crawl."""
+
+    def test_stops_at_max_depth(self) -> None:
+        """Test links found at max_depth are not followed."""
+        site = FakeSite(
+            {
+                "/": page("home", "/a"),
+                "/a": page("depth one", "/b"),
+                "/b": page("depth two", "/c"),
+                "/c": page("depth three"),
+            }
+        )
+
+        pages = site.scraper(max_depth=2).scrape_recursive("https://mobibikes.ca/")
+
+        assert sorted(pages) == [
+            "https://mobibikes.ca/",
+            "https://mobibikes.ca/a",
+            "https://mobibikes.ca/b",
+        ]
+        assert site.paths() == ["/", "/a", "/b"]
+
+    def test_each_url_is_requested_once(self) -> None:
+        """Test links seen on several pages, including back-links, are queued once."""
+        site = FakeSite(
+            {
+                "/": page("home", "/a", "/b", "/"),
+                "/a": page("page a", "/c", "/b", "/"),
+                "/b": page("page b", "/c", "/a"),
+                "/c": page("page c", "/", "/a", "/b"),
+            }
+        )
+
+        pages = site.scraper().scrape_recursive("https://mobibikes.ca/")
+
+        assert len(pages) == 4
+        assert site.paths() == ["/", "/a", "/b", "/c"]
+
+    def test_duplicate_content_still_yields_links(self) -> None:
+        """Test a page with already-seen text is not stored but its links are followed."""
+        site = FakeSite(
+            {
+                "/": page("home", "/a", "/alias"),
+                "/a": page("same text", "/c"),
+                "/alias": page("same text", "/d"),
+                "/c": page("page c"),
+                "/d": page("page d"),
+            }
+        )
+
+        pages = site.scraper().scrape_recursive("https://mobibikes.ca/")
+
+        assert site.paths() == ["/", "/a", "/alias", "/c", "/d"]
+        assert len(pages) == 4
+        assert {"https://mobibikes.ca/c", "https://mobibikes.ca/d"} <= set(pages)
+
+    def test_throttle_spaces_request_starts(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test back-to-back request starts are scheduled delay / max_workers apart."""
+        clock = FakeClock()
+        monkeypatch.setattr(basic_site_scraper, "time", clock)
+        scraper = BasicSiteScraper("https://mobibikes.ca/", delay=0.2, max_workers=4)
+
+        starts = []
+        for _ in range(4):
+            scraper._throttle()
+            starts.append(clock.now)
+
+        assert clock.sleeps == pytest.approx([0.05, 0.05, 0.05])
+        assert starts == pytest.approx([100.0, 100.05, 100.1, 100.15])
+
+    def test_crawl_is_throttled(self) -> None:
+        """Test a concurrent crawl of eight pages takes at least seven intervals."""
+        links = [f"/p{i}" for i in range(7)]
+        site = FakeSite({"/": page("home", *links), **{link: page(link) for link in links}})
+
+        started = time.monotonic()
+        site.scraper(delay=0.2, max_workers=4).scrape_recursive("https://mobibikes.ca/")
+
+        assert len(site.requests) == 8
+        assert time.monotonic() - started >= 7 * 0.05
@@ -0,0 +1,255 @@
+"""Unit tests for the Mobi system-data downloader against a local HTTP server."""
+
+import hashlib
+import json
+import threading
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pytest
+
+from mobi import data_downloader
+from mobi.data_downloader import (
+    MobiDataDownloaderError,
+    _extract_anchors,
+    download_all_trip_data,
+    download_file,
+    get_available_data_files,
+)
+
+LAST_MODIFIED = "Wed, 01 May 2024 12:00:00 GMT"
+
+LISTING = (
+    b"<html><body><h1>System data</h1>"
+    b"<p><a href='/files/2024-05.csv'>May 2024</a></p>"
+    b"<p><a href='/about'>About</a></p>"
+    b"</body></html>"
+)
+
+
+class _Route:
+    def __init__(
+        self,
+        body: bytes,
+        status: int = 200,
+        headers: Optional[dict[str, str]] = None,
+        length: Optional[int] = None,
+    ) -> None:
+        self.body = body
+        self.status = status
+        # A Content-Length longer than the body simulates a dropped transfer
+        self.length = len(body) if length is None else length
+        self.headers = {"Content-Type": "text/csv", **(headers or {})}
+
+
+class FakeSite:
+    """Serves canned responses and records the headers of every request."""
+
+    def __init__(self) -> None:
+        self.routes: dict[str, _Route] = {}
+        self.requests: list[tuple[str, dict[str, str]]] = []
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                site.requests.append((self.path, dict(self.headers)))
+                route = site.routes.get(self.path)
+                if route is None:
+                    self.send_error(404)
+                    return
+                self.send_response(route.status)
+                for name, value in route.headers.items():
+                    self.send_header(name, value)
+                if route.status != 304:
+                    self.send_header("Content-Length", str(route.length))
+                self.end_headers()
+                if route.status != 304:
+                    self.wfile.write(route.body)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}{path}"
+
+    def paths(self) -> list[str]:
+        return [path for path, _ in self.requests]
+
+    def reset(self) -> None:
+        self.routes.clear()
+        self.requests.clear()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture(scope="module")
+def server() -> Iterator[FakeSite]:
+    server = FakeSite()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def site(server: FakeSite) -> FakeSite:
+    server.reset()
+    server.routes["/system-data"] = _Route(
+        LISTING, headers={"Content-Type": "text/html", "Last-Modified": LAST_MODIFIED}
+    )
+    return server
+
+
+class TestExtractAnchors:
+    """Anchor extraction from a chunked HTML stream."""
+
+    def test_anchors_split_across_chunks(self) -> None:
+        """Test anchors are found even when tags straddle chunk boundaries."""
+        page = (
+            b"<html><body><div><p>Intro</p><a href='/one.csv'>May <b>2024</b></a></div>"
+            b"<a name='top'>no href</a><ul><li><a href='/two.zip'> June 2024 </a></li></ul>"
+            b"</body></html>"
+        )
+        chunks = [page[i : i + 7] for i in range(0, len(page), 7)]
+
+        assert _extract_anchors(chunks) == [("/one.csv", "May 2024"), ("/two.zip", "June 2024")]
+
+
+class TestListingCache:
+    """The conditional-GET cache of the system-data page listing."""
+
+    def test_saves_listing_stamped_with_last_modified(self, site: FakeSite, tmp_path: Path) -> None:
+        """Test the parsed listing is cached with the page's Last-Modified as mtime."""
+        cache = tmp_path / "listing.json"
+
+        files = get_available_data_files(site.url("/system-data"), cache_path=cache)
+
+        assert [(f["url"], f["filename"]) for f in files] == [
+            (site.url("/files/2024-05.csv"), "mobi_2024_May.csv")
+        ]
+        assert json.loads(cache.read_text()) == {
+            "base_url": site.url("/system-data"),
+            "files": files,
+        }
+        assert cache.stat().st_mtime == parsedate_to_datetime(LAST_MODIFIED).timestamp()
+        assert "If-Modified-Since" not in site.requests[0][1]
+
+    def test_not_modified_returns_cached_listing(self, site: FakeSite, tmp_path: Path) -> None:
+        """Test a 304 answer to If-Modified-Since returns the cached listing."""
+        cache = tmp_path / "listing.json"
+        first = get_available_data_files(site.url("/system-data"), cache_path=cache)
+        site.routes["/system-data"] = _Route(b"", status=304)
+
+        second = get_available_data_files(site.url("/system-data"), cache_path=cache)
+
+        assert second == first
+        assert site.requests[1][1]["If-Modified-Since"] == LAST_MODIFIED
+
+    def test_cache_for_another_url_is_ignored(self, site: FakeSite, tmp_path: Path) -> None:
+        """Test a listing cached for a different base_url is not revalidated or reused."""
+        cache = tmp_path / "listing.json"
+        cache.write_text(json.dumps({"base_url": "https://example.com/other", "files": []}))
+
+        files = get_available_data_files(site.url("/system-data"), cache_path=cache)
+
+        assert len(files) == 1
+        assert "If-Modified-Since" not in site.requests[0][1]
+        assert json.loads(cache.read_text())["base_url"] == site.url("/system-data")
+
+    def test_corrupt_cache_is_refetched(self, site: FakeSite, tmp_path: Path) -> None:
+        """Test an unreadable cache file falls back to a full fetch and is rewritten."""
+        cache = tmp_path / "listing.json"
+        cache.write_text("{not json")
+
+        files = get_available_data_files(site.url("/system-data"), cache_path=cache)
+
+        assert len(files) == 1
+        assert "If-Modified-Since" not in site.requests[0][1]
+        assert json.loads(cache.read_text())["files"] == files
+
+
+class TestDownloadFile:
+    """Streaming a single file to disk."""
+
+    def test_writes_file_and_digest_sidecar(self, site: FakeSite, tmp_path: Path) -> None:
+        """Test the download replaces its .part file and records a blake2b digest."""
+        body = b"trip_id,duration\n1,600\n" * 100
+        site.routes["/a.csv"] = _Route(body)
+        output = tmp_path / "out" / "a.csv"
+
+        assert download_file(site.url("/a.csv"), output, chunk_size=64) == output
+
+        assert output.read_bytes() == body
+        sidecar = tmp_path / "out" / "a.csv.blake2b"
+        assert sidecar.read_text() == hashlib.blake2b(body, digest_size=16).hexdigest() + "\n"
+        assert sorted(p.name for p in output.parent.iterdir()) == ["a.csv", "a.csv.blake2b"]
+
+    def test_failure_keeps_existing_file(self, site: FakeSite, tmp_path: Path) -> None:
+        """Test a rejected download leaves no .part file and the old file untouched."""
+        site.routes["/a.csv"] = _Route(
+            b"<html>scan warning</html>", headers={"Content-Type": "text/html"}
+        )
+        output = tmp_path / "a.csv"
+        output.write_bytes(b"old")
+
+        with pytest.raises(MobiDataDownloaderError, match="HTML content"):
+            download_file(site.url("/a.csv"), output)
+
+        assert output.read_bytes() == b"old"
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["a.csv"]
+
+    def test_dropped_transfer_removes_part_file(self, site: FakeSite, tmp_path: Path) -> None:
+        """Test a connection closed mid-body discards the .part file."""
+        site.routes["/a.csv"] = _Route(b"trip_id\n1\n", length=1000)
+        output = tmp_path / "a.csv"
+        output.write_bytes(b"old")
+
+        with pytest.raises(MobiDataDownloaderError, match="Failed to download"):
+            download_file(site.url("/a.csv"), output)
+
+        assert output.read_bytes() == b"old"
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["a.csv"]
+
+    def test_http_error_is_wrapped(self, site: FakeSite, tmp_path: Path) -> None:
+        """Test HTTP errors surface as MobiDataDownloaderError without leftovers."""
+        with pytest.raises(MobiDataDownloaderError, match="Failed to download"):
+            download_file(site.url("/missing.csv"), tmp_path / "m.csv")
+
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestDownloadAllTripData:
+    """Downloading every listed file."""
+
+    def test_duplicate_filenames_are_fetched_once(self, site: FakeSite, tmp_path: Path) -> None:
+        """Test undated links sharing a filename only download the first one."""
+        site.routes["/system-data"] = _Route(
+            b"<a href='/files/undated-a.csv'>Archive</a>"
+            b"<a href='/files/undated-b.csv'>Older archive</a>"
+            b"<a href='/files/2024-05.csv'>May 2024</a>",
+            headers={"Content-Type": "text/html"},
+        )
+        for name in ("undated-a", "undated-b", "2024-05"):
+            site.routes[f"/files/{name}.csv"] = _Route(name.encode())
+
+        paths = download_all_trip_data(tmp_path, base_url=site.url("/system-data"))
+
+        assert paths == [tmp_path / "mobi_Unknown_Unknown.csv", tmp_path / "mobi_2024_May.csv"]
+        assert (tmp_path / "mobi_Unknown_Unknown.csv").read_bytes() == b"undated-a"
+        assert "/files/undated-b.csv" not in site.paths()
+
+    def test_existing_files_are_skipped(self, site: FakeSite, tmp_path: Path) -> None:
+        """Test files already on disk are returned without being downloaded again."""
+        existing = tmp_path / "mobi_2024_May.csv"
+        existing.write_bytes(b"kept")
+
+        assert download_all_trip_data(tmp_path, base_url=site.url("/system-data")) == [existing]
+        assert existing.read_bytes() == b"kept"
+        assert site.paths() == ["/system-data"]
+        assert (tmp_path / data_downloader._LISTING_CACHE_NAME).exists()
@@ -0,0 +1,116 @@
+"""Unit tests for metadata_agent SQL quoting and comment application, using a fake Spark."""
+
+from typing import Callable
+
+import pytest
+from pyspark.sql.types import IntegerType, StringType, StructField, StructType
+
+from mobi import metadata_agent
+from mobi.metadata_agent import _quote_identifier, _quote_literal, analyze_and_update_table
+
+FULL = "`vanhack`.`mobi_data`.`trips`"
+
+SCHEMA = StructType(
+    [StructField("station id", StringType()), StructField("duration_sec", IntegerType())]
+)
+
+
+class FakeTable:
+    """Just enough of a DataFrame for analyze_and_update_table."""
+
+    schema = SCHEMA
+
+    def select(self, *cols: str) -> "FakeTable":
+        return self
+
+
+class FakeSpark:
+    """Records SQL statements and raises for those matching `rejects`."""
+
+    def __init__(self, rejects: Callable[[str], bool] = lambda sql: False) -> None:
+        self.rejects = rejects
+        self.statements: list[str] = []
+
+    def table(self, name: str) -> FakeTable:
+        return FakeTable()
+
+    def sql(self, statement: str) -> None:
+        self.statements.append(statement)
+        if self.rejects(statement):
+            raise RuntimeError("PARSE_SYNTAX_ERROR")
+
+
+@pytest.fixture(autouse=True)
+def stub_analysis(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Skip the Spark statistics and give each column a comment that needs quoting."""
+    monkeypatch.setattr(metadata_agent, "_basic_stats_for_column", lambda sdf, col: {})
+    monkeypatch.setattr(
+        metadata_agent, "_suggest_comment", lambda col, dtype, stats: f"{col}'s value"
+    )
+
+
+def apply(spark: FakeSpark) -> list[dict]:
+    return analyze_and_update_table(spark, "vanhack", "mobi_data", "trips", dry_run=False)
+
+
+class TestQuoting:
+    """SQL identifier and literal quoting."""
+
+    def test_literal_escapes_backslashes_and_quotes(self) -> None:
+        """Test backslashes are doubled before quotes are escaped."""
+        assert _quote_literal("it's \\ ok") == "'it\\'s \\\\ ok'"
+
+    def test_identifier_doubles_backticks(self) -> None:
+        """Test identifiers with spaces and backticks stay one identifier."""
+        assert _quote_identifier("odd `name`") == "`odd ``name```"
+
+
+class TestApplyComments:
+    """Applying suggested comments with dry_run=False."""
+
+    def test_dry_run_issues_no_sql(self) -> None:
+        """Test a dry run only computes suggestions."""
+        spark = FakeSpark()
+
+        suggestions = analyze_and_update_table(spark, "vanhack", "mobi_data", "trips")
+
+        assert [s["column"] for s in suggestions] == ["station id", "duration_sec"]
+        assert spark.statements == []
+
+    def test_single_batched_statement(self) -> None:
+        """Test every comment is set by one multi-column ALTER TABLE."""
+        spark = FakeSpark()
+
+        apply(spark)
+
+        assert spark.statements == [
+            f"ALTER TABLE {FULL} ALTER COLUMN "
+            "`station id` COMMENT 'station id\\'s value', "
+            "`duration_sec` COMMENT 'duration_sec\\'s value'"
+        ]
+
+    def test_rejected_batch_falls_back_per_column(self) -> None:
+        """Test a rejected batch is retried as one COMMENT ON COLUMN per column."""
+        spark = FakeSpark(rejects=lambda sql: "ALTER COLUMN" in sql)
+
+        apply(spark)
+
+        assert spark.statements[0].startswith(f"ALTER TABLE {FULL} ALTER COLUMN ")
+        assert spark.statements[1:] == [
+            f"COMMENT ON COLUMN {FULL}.`station id` IS 'station id\\'s value'",
+            f"COMMENT ON COLUMN {FULL}.`duration_sec` IS 'duration_sec\\'s value'",
+        ]
+
+    def test_change_column_uses_column_type(self) -> None:
+        """Test the last-resort CHANGE COLUMN restates each column's own type."""
+        spark = FakeSpark(rejects=lambda sql: "CHANGE COLUMN" not in sql)
+
+        apply(spark)
+
+        change = [sql for sql in spark.statements if "CHANGE COLUMN" in sql]
+        assert change == [
+            f"ALTER TABLE {FULL} CHANGE COLUMN `station id` `station id` string "
+            "COMMENT 'station id\\'s value'",
+            f"ALTER TABLE {FULL} CHANGE COLUMN `duration_sec` `duration_sec` int "
+            "COMMENT 'duration_sec\\'s value'",
+        ]
@@ -0,0 +1,437 @@
+"""Unit tests for DatabricksAgent intent routing and tool batching."""
+
+import re
+from typing import Any, Iterator, Optional
+
+import pytest
+from pyspark.errors import AnalysisException
+from pyspark.sql import Row
+
+from mobi import sample_agent
+from mobi.sample_agent import DatabricksAgent
+
+FUNCTIONS = ("live_station_status", "nearby_stations", "recent_trips_by_station")
+LIVE_COLUMNS = ("num_bikes_available", "num_docks_available", "is_renting", "is_returning")
+
+
+class FakeDataFrame:
+    """The subset of the DataFrame API the agent uses."""
+
+    def __init__(self, rows: list[Row]) -> None:
+        self.rows = rows
+
+    def collect(self) -> list[Row]:
+        return list(self.rows)
+
+    def take(self, n: int) -> list[Row]:
+        return self.rows[:n]
+
+    def toLocalIterator(self) -> Iterator[Row]:  # noqa: N802 - mirrors the PySpark API
+        return iter(self.rows)
+
+
+class FakeSpark:
+    """Answers the agent's SQL from in-memory per-station data.
+
+    UNION ALL branches are answered in reverse order, so the tests also check
+    that results are mapped back through req_idx rather than row position.
+
+    `arg_type` is the station-id type the functions really take; a BIGINT
+    function rejects string-bound ids with an AnalysisException, as Spark
+    does for a signature mismatch. `describe` controls whether DESCRIBE
+    FUNCTION reports that type or returns output the agent can't parse.
+    """
+
+    def __init__(
+        self,
+        live: Optional[dict[str, dict[str, Any]]] = None,
+        trips: Optional[dict[str, list[dict[str, Any]]]] = None,
+        fail: bool = False,
+        arg_type: str = "STRING",
+        describe: bool = True,
+    ) -> None:
+        self.live = live or {}
+        self.trips = trips or {}
+        self.fail = fail
+        self.show_functions_fails = False
+        self.arg_type = arg_type
+        self.describe = describe
+        self.queries: list[tuple[str, Optional[dict[str, Any]]]] = []
+
+    def sql(self, query: str, args: Optional[dict[str, Any]] = None) -> FakeDataFrame:
+        self.queries.append((query, args))
+        if query.startswith("SHOW FUNCTIONS"):
+            if self.show_functions_fails:
+                raise RuntimeError("metastore unavailable")
+            return FakeDataFrame([Row(function=f"vanhack.mobi_data.{fn}") for fn in FUNCTIONS])
+        if query.startswith("DESCRIBE FUNCTION"):
+            desc = f"Input: station_id {self.arg_type}" if self.describe else "Usage: N/A."
+            return FakeDataFrame([Row(function_desc=desc)])
+        if self.fail:
+            raise RuntimeError("cluster unavailable")
+
+        args = args or {}
+        if "UNION ALL" in query:
+            stations = [(int(i), args[f"sid{i}"]) for i in re.findall(r":sid(\d+)", query)]
+        else:
+            stations = [(None, args["station_id"])]
+        if self.arg_type == "BIGINT" and any(isinstance(sid, str) for _, sid in stations):
+            raise AnalysisException("[DATATYPE_MISMATCH] station_id requires BIGINT")
+
+        rows = []
+        for req_idx, sid in reversed(stations):
+            extra = {} if req_idx is None else {"req_idx": req_idx}
+            sid = str(sid)
+            if "live_station_status" in query and sid in self.live:
+                rows.append(Row(**extra, station_id=sid, **self.live[sid]))
+            elif "recent_trips_by_station" in query:
+                rows.extend(Row(**extra, **t) for t in self.trips.get(sid, [])[: args["lim"]])
+        return FakeDataFrame(rows)
+
+    def tool_queries(self) -> list[tuple[str, Optional[dict[str, Any]]]]:
+        return [(q, a) for q, a in self.queries if q.startswith(("SELECT", "("))]
+
+    def count(self, prefix: str) -> int:
+        return sum(q.startswith(prefix) for q, _ in self.queries)
+
+    def union_queries(self) -> list[str]:
+        return [q for q, _ in self.queries if "UNION ALL" in q]
+
+
+def live_row(bikes: int) -> dict[str, Any]:
+    return dict(zip(LIVE_COLUMNS, (bikes, 10, True, True)))
+
+
+def trip(trip_id: int) -> dict[str, Any]:
+    return {"trip_id": trip_id, "departure_time": "2024-06-01 08:00:00", "duration_sec": 600}
+
+
+MESSAGES = [
+    "Are there bikes available at station 0152?",
+    "What's the availability at station 42",
+    "bikes at station 0100 please",
+    "Show recent trips at station 0152",
+    "recent trip list for station 77",
+    "Find stations near 49.2827, -123.1207",
+    "closest dock to 49.28 -123.12",
+    "How do I rent a bike?",
+    "",
+    "recent availability near trip",
+]
+
+
+class TestIntentHits:
+    """The Hyperscan and regex keyword scans must agree."""
+
+    def test_hyperscan_matches_regex(self) -> None:
+        """Test both scan paths report the same keyword groups."""
+        pytest.importorskip("hyperscan")
+        if sample_agent._INTENT_DB is None:
+            pytest.skip("hyperscan database could not be built on this machine")
+
+        for message in MESSAGES:
+            text = message.lower()
+            assert sample_agent._intent_hits(text) == sample_agent._regex_intent_hits(text)
+
+    def test_falls_back_to_regex_without_database(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test the compiled alternation is used when no database is available."""
+        monkeypatch.setattr(sample_agent, "_INTENT_DB", None)
+
+        assert sample_agent._intent_hits("recent trips near station 12") == {
+            "recent",
+            "trip",
+            "nearby",
+        }
+
+    def test_broken_hyperscan_falls_back(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test a hyperscan that imports but cannot compile disables the fast path."""
+
+        class BrokenHyperscan:
+            HS_MODE_BLOCK = 0
+            HS_FLAG_SINGLEMATCH = 0
+
+            @staticmethod
+            def Database(**kwargs: object) -> object:  # noqa: N802 - mirrors hyperscan API
+                raise RuntimeError("unsupported CPU")
+
+        monkeypatch.setattr(sample_agent, "hyperscan", BrokenHyperscan)
+
+        assert sample_agent._build_intent_db() is None
+
+
+class TestDetectIntent:
+    """Routing decisions, pinned to the behaviour of the original per-keyword probes."""
+
+    @pytest.mark.parametrize(
+        ("message", "intent", "params"),
+        [
+            ("Are there bikes available at station 0152?", "live_status", {"station_id": "0152"}),
+            ("availability station 12", "live_status", {"station_id": "12"}),
+            ("bikes at station 0042", "live_status", {"station_id": "0042"}),
+            ("STATION 0152 AVAILABLE", "live_status", {"station_id": "0152"}),
+            ("unavailable station 12", "live_status", {"station_id": "12"}),
+            ("Show recent trips at station 0152", "recent_trips", {"station_id": "0152"}),
+            ("trip history recent station 77", "recent_trips", {"station_id": "77"}),
+            (
+                "Find stations near 49.2827, -123.1207",
+                "nearby",
+                {"lat": 49.2827, "lon": -123.1207, "radius_km": 1.0},
+            ),
+            ("closest to 49.1 -123.2", "nearby", {"lat": 49.1, "lon": -123.2, "radius_km": 1.0}),
+            (
+                "available near 49.1, -123.1 station 3",
+                "nearby",
+                {"lat": 49.1, "lon": -123.1, "radius_km": 1.0},
+            ),
+            (
+                "recent trip at station 9 near 1.0 2.0",
+                "nearby",
+                {"lat": 1.0, "lon": 2.0, "radius_km": 1.0},
+            ),
+            ("nearest station 1.5, 2.5", "nearby", {"lat": 1.5, "lon": 2.5, "radius_km": 1.0}),
+            ("recent trips please", "help", {}),
+            ("nearby 49.2", "help", {}),
+            ("How do I rent a bike?", "help", {}),
+            ("pricing", "help", {}),
+            ("hello", "help", {}),
+        ],
+    )
+    def test_routing(self, message: str, intent: str, params: dict[str, Any]) -> None:
+        """Test each message is routed to the expected intent and params."""
+        detected, detected_params = sample_agent._detect_intent(message)
+
+        assert detected == intent
+        assert dict(detected_params) == params
+
+    def test_query_returns_fresh_params(self) -> None:
+        """Test callers mutating params can't corrupt the memoized result."""
+        agent = DatabricksAgent(FakeSpark(live={"0152": live_row(3)}))
+        message = "bikes available at station 0152"
+
+        agent.query(message)["params"]["station_id"] = "mutated"
+
+        assert agent.query(message)["params"] == {"station_id": "0152"}
+
+
+class TestQueryMany:
+    """UNION ALL batching in query_many and the _call_*_many helpers."""
+
+    def test_responses_follow_message_order(self) -> None:
+        """Test mixed intents come back in the order they were asked."""
+        spark = FakeSpark(live={"10": live_row(1), "20": live_row(2)}, trips={"30": [trip(7)]})
+        agent = DatabricksAgent(spark)
+        messages = [
+            "bikes available at station 20",
+            "hello",
+            "recent trips at station 30",
+            "bikes available at station 10",
+        ]
+
+        responses = agent.query_many(messages)
+
+        assert [r["intent"] for r in responses] == [
+            "live_status",
+            "help",
+            "recent_trips",
+            "live_status",
+        ]
+        assert responses[0]["answer"].startswith("Station 20: bikes=2")
+        assert responses[2]["raw"] == [trip(7)]
+        assert responses[3]["answer"].startswith("Station 10: bikes=1")
+        assert responses == [agent.query(m) for m in messages]
+
+    def test_duplicate_station_ids_share_one_branch(self) -> None:
+        """Test repeated stations are looked up once and answered for every message."""
+        spark = FakeSpark(live={"10": live_row(1), "20": live_row(2)})
+        agent = DatabricksAgent(spark)
+
+        responses = agent.query_many(
+            [
+                "bikes available at station 10",
+                "bikes available at station 20",
+                "availability at station 10",
+            ]
+        )
+
+        (union,) = spark.union_queries()
+        assert union.count("live_station_status(") == 2
+        assert responses[0]["raw"] == responses[2]["raw"] == {"station_id": "10", **live_row(1)}
+        assert responses[1]["raw"] == {"station_id": "20", **live_row(2)}
+
+    def test_station_without_rows(self) -> None:
+        """Test stations with no result rows get None / [] rather than another's rows."""
+        spark = FakeSpark(live={"10": live_row(1)}, trips={"10": [trip(1), trip(2)]})
+        agent = DatabricksAgent(spark)
+
+        live = agent._call_live_status_many(["10", "99"])
+        trips = agent._call_recent_trips_many(["99", "10"], limit=1)
+
+        assert live == {"10": {"station_id": "10", **live_row(1)}, "99": None}
+        assert trips == {"99": [], "10": [trip(1)]}
+
+    def test_missing_station_responses(self) -> None:
+        """Test empty lookups are reported per message."""
+        agent = DatabricksAgent(FakeSpark(live={"10": live_row(1)}))
+
+        responses = agent.query_many(
+            ["bikes available at station 10", "bikes available at station 99"]
+        )
+
+        assert responses[1]["answer"] == "No live status found for station 99"
+        assert responses[1]["raw"] is None
+
+    def test_error_fans_out_to_every_station(self) -> None:
+        """Test a failed batch returns the error for each requested id."""
+        agent = DatabricksAgent(FakeSpark(fail=True))
+
+        live = agent._call_live_status_many(["10", "20"])
+        trips = agent._call_recent_trips_many(["10", "20"])
+
+        assert set(live) == set(trips) == {"10", "20"}
+        for sid in ("10", "20"):
+            assert live[sid]["error"] == "cluster unavailable"
+            assert trips[sid][0]["error"] == "cluster unavailable"
+        responses = agent.query_many(
+            ["bikes available at station 10", "recent trips at station 20"]
+        )
+        assert [r["answer"] for r in responses] == [
+            "Error calling live status",
+            "Error fetching recent trips",
+        ]
+
+
+class TestStationBinding:
+    """Station ids bound by the declared signature, with the AnalysisException retry."""
+
+    def test_int_signature_binds_int(self) -> None:
+        """Test numeric ids are bound as integers for an integer argument."""
+        spark = FakeSpark(live={"10": live_row(1)}, arg_type="BIGINT")
+        agent = DatabricksAgent(spark)
+
+        assert agent.query("bikes available at station 10")["raw"]["num_bikes_available"] == 1
+        assert [a for _, a in spark.tool_queries()] == [{"station_id": 10}]
+        assert agent._fn_sig == {"live_station_status": "BIGINT"}
+
+    def test_string_signature_binds_string(self) -> None:
+        """Test ids stay strings (keeping leading zeros) for a STRING argument."""
+        spark = FakeSpark(live={"0152": live_row(1)})
+        agent = DatabricksAgent(spark)
+
+        agent.query("bikes available at station 0152")
+
+        assert [a for _, a in spark.tool_queries()] == [{"station_id": "0152"}]
+
+    def test_unparseable_signature_retries_once(self) -> None:
+        """Test a mismatch is retried with an int binding and the type is remembered."""
+        spark = FakeSpark(live={"10": live_row(1)}, arg_type="BIGINT", describe=False)
+        agent = DatabricksAgent(spark)
+
+        first = agent.query("bikes available at station 10")
+        second = agent.query("bikes available at station 10")
+
+        assert first["raw"] == second["raw"] == {"station_id": "10", **live_row(1)}
+        assert [a for _, a in spark.tool_queries()] == [
+            {"station_id": "10"},
+            {"station_id": 10},
+            {"station_id": 10},
+        ]
+        assert agent._fn_sig["live_station_status"] == "BIGINT"
+        assert spark.count("DESCRIBE") == 1
+
+    def test_batched_lookups_share_the_retry(self) -> None:
+        """Test query_many recovers from a mismatch the same way query() does."""
+        spark = FakeSpark(
+            live={"10": live_row(1), "20": live_row(2)},
+            trips={"10": [trip(1)], "20": [trip(2)]},
+            arg_type="BIGINT",
+            describe=False,
+        )
+        agent = DatabricksAgent(spark)
+
+        responses = agent.query_many(
+            [
+                "bikes available at station 10",
+                "bikes available at station 20",
+                "recent trips at station 10",
+                "recent trips at station 20",
+            ]
+        )
+
+        assert [r["raw"] for r in responses] == [
+            {"station_id": "10", **live_row(1)},
+            {"station_id": "20", **live_row(2)},
+            [trip(1)],
+            [trip(2)],
+        ]
+        assert agent._fn_sig == {
+            "live_station_status": "BIGINT",
+            "recent_trips_by_station": "BIGINT",
+        }
+
+    def test_non_numeric_id_is_not_retried(self) -> None:
+        """Test a mismatch with no alternative binding surfaces as the error dict."""
+        spark = FakeSpark(arg_type="BIGINT")
+        agent = DatabricksAgent(spark)
+
+        result = agent._call_live_status("A12")
+
+        assert "DATATYPE_MISMATCH" in result["error"]
+        assert len(spark.tool_queries()) == 1
+
+
+class TestFunctionCache:
+    """The SHOW FUNCTIONS cache and its TTL."""
+
+    @pytest.fixture
+    def clock(self, monkeypatch: pytest.MonkeyPatch) -> list[float]:
+        now = [1000.0]
+        monkeypatch.setattr(sample_agent.time, "monotonic", lambda: now[0])
+        return now
+
+    def test_list_is_cached(self) -> None:
+        """Test repeated lookups read SHOW FUNCTIONS once."""
+        spark = FakeSpark()
+        agent = DatabricksAgent(spark)
+
+        assert agent._function_exists("live_station_status")
+        assert not agent._function_exists("missing_fn")
+        assert spark.count("SHOW FUNCTIONS") == 1
+
+    def test_ttl_refresh_clears_signatures(self, clock: list[float]) -> None:
+        """Test an expired list is re-read and cached signatures are dropped."""
+        spark = FakeSpark()
+        agent = DatabricksAgent(spark, function_cache_ttl=60)
+        agent._function_exists("live_station_status")
+        agent._fn_sig["live_station_status"] = "BIGINT"
+
+        clock[0] += 30
+        agent._function_exists("live_station_status")
+        assert spark.count("SHOW FUNCTIONS") == 1
+
+        clock[0] += 31
+        agent._function_exists("live_station_status")
+        assert spark.count("SHOW FUNCTIONS") == 2
+        assert agent._fn_sig == {}
+
+    def test_failed_refresh_keeps_previous_list(self, clock: list[float]) -> None:
+        """Test a failing TTL refresh keeps answering from the last good list."""
+        spark = FakeSpark()
+        agent = DatabricksAgent(spark, function_cache_ttl=60)
+        agent._function_exists("live_station_status")
+
+        spark.show_functions_fails = True
+        clock[0] += 61
+
+        assert agent._function_exists("live_station_status")
+        assert agent._function_exists("nearby_stations")
+        # still expired, so every lookup retries the refresh
+        assert spark.count("SHOW FUNCTIONS") == 3
+
+    def test_failed_first_load_reports_missing(self) -> None:
+        """Test lookups fail closed when no list has ever been loaded."""
+        spark = FakeSpark()
+        spark.show_functions_fails = True
+        agent = DatabricksAgent(spark)
+
+        assert agent.query("bikes available at station 10")["answer"] == "Error calling live status"
+        assert agent._func_cache is None